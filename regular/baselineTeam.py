@@ -91,23 +91,11 @@ class ReflexCaptureAgent(CaptureAgent):
 
     return random.choice(bestActions)
 
-  def getSuccessor(self, gameState, action):
-    """
-    Finds the next successor which is a grid position (location tuple).
-    """
-    successor = gameState.generateSuccessor(self.index, action)
-    pos = successor.getAgentState(self.index).getPosition()
-    if pos != nearestPoint(pos):
-      # Only half a grid position was covered
-      return successor.generateSuccessor(self.index, action)
-    else:
-      return successor
-
   def evaluate(self, gameState, action):
     """
     Computes a linear combination of features and feature weights
     """
-    features = self.getFeatures(gameState, action)
+    features = self.getCachedFeatures(gameState, action)
     weights = self.getWeights(gameState, action)
     return features * weights
 
@@ -143,7 +131,7 @@ class OffensiveReflexAgent(ReflexCaptureAgent):
 
     if len(foodList) > 0: # This should always be True,  but better safe than sorry
       myPos = successor.getAgentState(self.index).getPosition()
-      minDistance = min([self.getMazeDistance(myPos, food) for food in foodList])
+      minDistance = self.distancer.nearest(myPos, foodList)[0]
       features['distanceToFood'] = minDistance
     return features
 
@@ -0,0 +1,98 @@
+# benchmarkSuccessors.py
+# ----------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Measures how fast GameState.generateSuccessor runs, which bounds how deep
+agents can search within their move time.
+
+A random walk is played from the start of a layout; at every state each
+legal action of the agent to move is expanded.  The number of successors
+generated per second is reported.  With --undo the moves are made in place
+on a SearchState and undone instead.
+
+Example:
+python benchmarkSuccessors.py -l jumboCapture -s 2000
+"""
+
+import random
+import sys
+import time
+import layout
+from capture import GameState, SearchState
+
+def randomWalkStates(gameState, steps, rand):
+  "Yields the states along a seeded random walk, restarting when a game ends"
+  start = gameState
+  agentIndex = 0
+  for step in range(steps):
+    yield gameState, agentIndex
+    gameState = gameState.generateSuccessor(agentIndex, rand.choice(gameState.getLegalActions(agentIndex)))
+    agentIndex = (agentIndex + 1) % gameState.getNumAgents()
+    if gameState.isOver() or gameState.data.timeleft <= 0:
+      gameState, agentIndex = start, 0
+
+def benchmark(layoutName, steps, repeats, seed, undo = False):
+  """
+  Returns (successors generated, best seconds over the repeats) for
+  expanding every state of the random walk.
+  """
+  lay = layout.getLayout(layoutName)
+  if lay is None:
+    raise Exception("The layout " + layoutName + " cannot be found")
+  start = GameState()
+  start.initialize(lay, len(lay.agentPositions))
+  start.data.timeleft = 1200
+  states = list(randomWalkStates(start, steps, random.Random(seed)))
+  if undo:
+    states = [(SearchState(state), agentIndex) for state, agentIndex in states]
+
+  best = None
+  count = 0
+  for i in range(repeats):
+    count = 0
+    began = time.time()
+    for state, agentIndex in states:
+      for action in state.getLegalActions(agentIndex):
+        if undo:
+          state.undo(state.apply(agentIndex, action))
+        else:
+          state.generateSuccessor(agentIndex, action)
+        count += 1
+    elapsed = time.time() - began
+    if best is None or elapsed < best:
+      best = elapsed
+  return count, best
+
+def readCommand(argv):
+  from optparse import OptionParser
+  parser = OptionParser('USAGE: python benchmarkSuccessors.py <options>')
+  parser.add_option('-l', '--layout', dest='layout', default='defaultCapture',
+                    help='the LAYOUT_FILE to expand states of [Default: defaultCapture]')
+  parser.add_option('-s', '--steps', type='int', default=1000,
+                    help='length of the random walk [Default: 1000]')
+  parser.add_option('-r', '--repeats', type='int', default=3,
+                    help='timing runs; the fastest is reported [Default: 3]')
+  parser.add_option('--seed', type='int', default=0,
+                    help='seed of the random walk [Default: 0]')
+  parser.add_option('-u', '--undo', action='store_true', default=False,
+                    help='apply and undo moves on a SearchState instead')
+  options, otherjunk = parser.parse_args(argv)
+  if len(otherjunk) != 0:
+    raise Exception('Command line input not understood: ' + str(otherjunk))
+  return options
+
+if __name__ == '__main__':
+  options = readCommand(sys.argv[1:])
+  count, seconds = benchmark(options.layout, options.steps, options.repeats, options.seed, options.undo)
+  print '%s: %d successors in %.3fs (%.0f successors/s)' % (options.layout, count, seconds, count / seconds)
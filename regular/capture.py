@@ -55,10 +55,13 @@ from game import Actions
 from util import nearestPoint
 from util import manhattanDistance
 from game import Grid
+from game import BitGrid
 from game import Configuration
 from game import Agent
 from game import reconstituteGrid
+from game import FrozenList
 import sys, util, types, time, random, imp
+from collections import deque
 import keyboardAgents
 
 # If you change these, you won't affect the server, so you can't cheat
@@ -103,6 +106,10 @@ class GameState:
   def generateSuccessor( self, agentIndex, action):
     """
     Returns the successor state (a GameState object) after the specified agent takes the action.
+
+    The successor shares the food, capsules and unchanged agent states with
+    this state, so treat what the accessors return as read-only; use
+    deepCopy() for a state you can edit freely.
     """
     # Copy current state
     state = GameState(self)
@@ -110,17 +117,27 @@ class GameState:
     # Find appropriate rules for the agent
     AgentRules.applyAction( state, action, agentIndex )
     AgentRules.checkDeath(state, agentIndex)
-    AgentRules.decrementTimer(state.data.agentStates[agentIndex])
+    AgentRules.decrementTimer(state.data.getMutableAgentState(agentIndex))
 
     # Book keeping
     state.data._agentMoved = agentIndex
     state.data.score += state.data.scoreChange
     state.data.timeleft = self.data.timeleft - 1
+    state.data.updateZobristKey(self.data._zobristKey, self.data.agentStates, self.data.score)
     return state
 
   def getAgentState(self, index):
     return self.data.agentStates[index]
 
+  def getZobristKey(self):
+    """
+    Returns a 64-bit key of the positions, directions, scared timers and
+    carried food of the agents, the food, the capsules and the score.
+    Successors update it incrementally, so it is cheap to use as a key into
+    a util.TranspositionTable during search.
+    """
+    return self.data.getZobristKey()
+
   def getAgentPosition(self, index):
     """
     Returns a location tuple if the agent with the given index is observable;
@@ -129,7 +146,7 @@ class GameState:
     agentState = self.data.agentStates[index]
     ret = agentState.getPosition()
     if ret:
-      return tuple(int(x) for x in ret)
+      return (int(ret[0]), int(ret[1]))
     return ret
 
   def getNumAgents( self ):
@@ -147,7 +164,10 @@ class GameState:
     For the matrix m, m[x][y]=true if there is food in (x,y) that belongs to
     red (meaning red is protecting it, blue is trying to eat it).
     """
-    return halfGrid(self.data.food, red = True)
+    views = self.data.teamViews
+    if views is None:
+      return halfGrid(self.data.food, red = True)
+    return views.redFood.copy()
 
   def getBlueFood(self):
     """
@@ -155,13 +175,40 @@ class GameState:
     For the matrix m, m[x][y]=true if there is food in (x,y) that belongs to
     blue (meaning blue is protecting it, red is trying to eat it).
     """
-    return halfGrid(self.data.food, red = False)
+    views = self.data.teamViews
+    if views is None:
+      return halfGrid(self.data.food, red = False)
+    return views.blueFood.copy()
+
+  def getRedFoodCount(self):
+    """
+    Returns the number of dots on the red team's side (the ones blue is trying to eat).
+    """
+    views = self.data.teamViews
+    if views is None:
+      return halfGrid(self.data.food, red = True).count()
+    return views.redFoodCount
+
+  def getBlueFoodCount(self):
+    """
+    Returns the number of dots on the blue team's side (the ones red is trying to eat).
+    """
+    views = self.data.teamViews
+    if views is None:
+      return halfGrid(self.data.food, red = False).count()
+    return views.blueFoodCount
 
   def getRedCapsules(self):
-    return halfList(self.data.capsules, self.data.food, red = True)
+    views = self.data.teamViews
+    if views is None:
+      return halfList(self.data.capsules, self.data.food, red = True)
+    return views.redCapsules[:]
 
   def getBlueCapsules(self):
-    return halfList(self.data.capsules, self.data.food, red = False)
+    views = self.data.teamViews
+    if views is None:
+      return halfList(self.data.capsules, self.data.food, red = False)
+    return views.blueCapsules[:]
 
   def getWalls(self):
     """
@@ -232,7 +279,7 @@ class GameState:
     Generates a new state by copying information from its predecessor.
     """
     if prevState != None: # Initial state
-      self.data = GameStateData(prevState.data)
+      self.data = GameStateData(prevState.data, copyOnWrite = True)
       self.blueTeam = prevState.blueTeam
       self.redTeam = prevState.redTeam
       self.data.timeleft = prevState.data.timeleft
@@ -254,13 +301,49 @@ class GameState:
     state.agentDistances = self.agentDistances[:]
     return state
 
+  def makeAgentView( self ):
+    """
+    Returns a copy of the state that is safe to hand to an agent, without
+    the cost of deepCopy.  The food grid and capsule list are shared with
+    this state but read-only (editing them raises TypeError; the rules
+    replace rather than edit them, so successors of the view still work),
+    as is the layout.  The view has its own copies of the agent states,
+    their configurations, the team views and the team lists.
+    """
+    state = GameState( self )
+    data = state.data
+    data.food = self.data.food.copy()
+    data.food.freeze()
+    data.capsules = FrozenList( self.data.capsules )
+    data.agentStates = [agentState.deepCopy() for agentState in self.data.agentStates]
+    if data.teamViews is not None:
+      data.teamViews = data.teamViews.copy()
+    data._ownedAgentStates = None
+    data._eaten = self.data._eaten[:]
+    data._agentMoved = self.data._agentMoved
+    data._foodEaten = self.data._foodEaten
+    data._foodAdded = self.data._foodAdded
+    data._capsuleEaten = self.data._capsuleEaten
+
+    state.blueTeam = self.blueTeam[:]
+    state.redTeam = self.redTeam[:]
+    state.teams = self.teams[:]
+    state.agentDistances = self.agentDistances[:]
+    return state
+
   def makeObservation(self, index):
-    state = self.deepCopy()
+    """
+    Returns what agent index observes: an agent view (see makeAgentView)
+    with sonar distances to every agent, and without the positions of
+    opponents out of sight of its team.  This state is not changed.
+    """
+    state = self.makeAgentView()
 
     # Adds the sonar signal
-    pos = state.getAgentPosition(index)
     n = state.getNumAgents()
-    distances = [manhattanDistance(pos, state.getAgentPosition(i)) for i in range(n)]
+    positions = [state.getAgentPosition(i) for i in range(n)]
+    pos = positions[index]
+    distances = [manhattanDistance(pos, positions[i]) for i in range(n)]
     state.agentDistances = distances
 
     # Remove states of distant opponents
@@ -273,9 +356,9 @@ class GameState:
 
     for enemy in otherTeam:
       seen = False
-      enemyPos = state.getAgentPosition(enemy)
+      enemyPos = positions[enemy]
       for teammate in team:
-        if util.manhattanDistance(enemyPos, state.getAgentPosition(teammate)) <= SIGHT_RANGE:
+        if util.manhattanDistance(enemyPos, positions[teammate]) <= SIGHT_RANGE:
           seen = True
       if not seen: state.data.agentStates[enemy].configuration = None
     return state
@@ -306,6 +389,7 @@ class GameState:
     self.blueTeam = [i for i,p in enumerate(positions) if not self.isRed(p)]
     self.redTeam = [i for i,p in enumerate(positions) if self.isRed(p)]
     self.teams = [self.isRed(p) for p in positions]
+    self.data.teamViews = TeamViews(self.data.food, self.data.capsules)
     #This is usually 60 (always 60 with random maps)
     #However, if layout map is specified otherwise, it could be less
     global TOTAL_FOOD
@@ -318,8 +402,71 @@ class GameState:
     else:
       return configOrPos.pos[0] < width / 2
 
+class SearchState(GameState):
+  """
+  A GameState that search agents can move forwards and backwards in place,
+  instead of allocating a new state per node with generateSuccessor:
+
+    searchState = SearchState(gameState)
+    token = searchState.apply(agentIndex, action)
+    value = evaluate(searchState)
+    searchState.undo(token)
+
+  apply runs the same AgentRules as generateSuccessor.  Those rules replace
+  the food grid, capsule list and team views rather than editing them, and
+  copy an agent state before changing it, so undoing a move only has to put
+  back the references saved in its token.  Moves must be undone in the
+  reverse order they were applied.  The state passed in is never changed.
+  """
+  def __init__( self, gameState ):
+    GameState.__init__( self, gameState )
+
+  def apply( self, agentIndex, action ):
+    """
+    Makes agentIndex take action, changing this state in place.  Returns a
+    token that undo accepts to restore the state from before the move.
+    """
+    data = self.data
+    token = (data.food, data.capsules, data.teamViews, data.agentStates[:],
+             data._ownedAgentStates, data._zobristKey, data.score, data.scoreChange, data.timeleft,
+             data.redReturned, data.blueReturned,
+             data._foodEaten, data._foodAdded, data._capsuleEaten,
+             data._agentMoved, data._win, data._lose)
+
+    # Same starting point as GameStateData( data, copyOnWrite = True )
+    data._ownedAgentStates = [False for agentState in data.agentStates]
+    data._foodEaten = None
+    data._foodAdded = None
+    data._capsuleEaten = None
+    data.scoreChange = 0
+
+    AgentRules.applyAction( self, action, agentIndex )
+    AgentRules.checkDeath( self, agentIndex )
+    AgentRules.decrementTimer( data.getMutableAgentState(agentIndex) )
+
+    data._agentMoved = agentIndex
+    data.score += data.scoreChange
+    data.timeleft -= 1
+    data.updateZobristKey(token[5], token[3], token[6])
+    return token
+
+  def undo( self, token ):
+    "Restores the state from before the move that returned token"
+    data = self.data
+    (data.food, data.capsules, data.teamViews, data.agentStates,
+     data._ownedAgentStates, data._zobristKey, data.score, data.scoreChange, data.timeleft,
+     data.redReturned, data.blueReturned,
+     data._foodEaten, data._foodAdded, data._capsuleEaten,
+     data._agentMoved, data._win, data._lose) = token
+
 def halfGrid(grid, red):
   halfway = grid.width / 2
+  if isinstance(grid, BitGrid):
+    halfgrid = grid.copy()
+    if red:   halfgrid.bits &= grid.getMask(0, halfway)
+    else:     halfgrid.bits &= grid.getMask(halfway, grid.width)
+    return halfgrid
+
   halfgrid = Grid(grid.width, grid.height, False)
   if red:    xrange = range(halfway)
   else:       xrange = range(halfway, grid.width)
@@ -338,6 +485,58 @@ def halfList(l, grid, red):
     elif not red and x > halfway: newList.append((x,y))
   return newList
 
+class TeamViews:
+  """
+  The food and capsules split by side, as returned by the team accessors of
+  GameState.  A TeamViews is shared by a state and its successors and is
+  never changed in place (its grids and lists are frozen): the update
+  methods return a new one that copies only the grid or list being changed,
+  and keeps the food counts as ints.  States made by deepCopy have none,
+  since their food and capsules may be edited; their accessors split the
+  food and capsules afresh on every call.
+  """
+  def __init__(self, food = None, capsules = None):
+    if food is not None:
+      self.halfway = food.width / 2
+      self.redFood = halfGrid(food, red = True)
+      self.blueFood = halfGrid(food, red = False)
+      self.redFood.freeze()
+      self.blueFood.freeze()
+      self.redFoodCount = self.redFood.count()
+      self.blueFoodCount = self.blueFood.count()
+      self.redCapsules = FrozenList(halfList(capsules, food, red = True))
+      self.blueCapsules = FrozenList(halfList(capsules, food, red = False))
+
+  def copy(self):
+    views = TeamViews()
+    views.__dict__.update(self.__dict__)
+    return views
+
+  def setFood(self, x, y, value):
+    "Returns the views with the food at (x,y) set to value"
+    views = self.copy()
+    if x < self.halfway:
+      if self.redFood[x][y] != value:
+        views.redFood = self.redFood.copy()
+        views.redFood[x][y] = value
+        views.redFood.freeze()
+        views.redFoodCount += 1 if value else -1
+    elif self.blueFood[x][y] != value:
+      views.blueFood = self.blueFood.copy()
+      views.blueFood[x][y] = value
+      views.blueFood.freeze()
+      views.blueFoodCount += 1 if value else -1
+    return views
+
+  def removeCapsule(self, position):
+    "Returns the views without the capsule at position"
+    views = self.copy()
+    if position in self.redCapsules:
+      views.redCapsules = FrozenList([c for c in self.redCapsules if c != position])
+    if position in self.blueCapsules:
+      views.blueCapsules = FrozenList([c for c in self.blueCapsules if c != position])
+    return views
+
 ############################################################################
 #                     THE HIDDEN SECRETS OF PACMAN                         #
 #                                                                          #
@@ -346,6 +545,22 @@ def halfList(l, grid, red):
 
 COLLISION_TOLERANCE = 0.7 # How close ghosts must be to Pacman to kill
 
+DUMP_CELLS_CACHE = {}
+
+def getDumpCells(layout, isRed):
+  """
+  Returns the set of cells a Pacman of the given side may drop food on when
+  it dies: open cells strictly inside the border, on the opponents' half.
+  Shared by every layout with the same walls.
+  """
+  key = (layout.getWallFingerprint(), isRed)
+  if key not in DUMP_CELLS_CACHE:
+    width, height = layout.width, layout.height
+    DUMP_CELLS_CACHE[key] = frozenset([(x, y) for x, y in layout.walls.asList(False)
+                                       if 0 < x < width and 0 < y < height
+                                       and (x < width / 2) == isRed])
+  return DUMP_CELLS_CACHE[key]
+
 class CaptureRules:
   """
   These game rules manage the control flow of a game, deciding when
@@ -366,8 +581,8 @@ class CaptureRules:
     game.state.data.timeleft = length
     if 'drawCenterLine' in dir(display):
       display.drawCenterLine()
-    self._initBlueFood = initState.getBlueFood().count()
-    self._initRedFood = initState.getRedFood().count()
+    self._initBlueFood = initState.getBlueFoodCount()
+    self._initRedFood = initState.getRedFoodCount()
     return game
 
   def process(self, state, game):
@@ -381,16 +596,10 @@ class CaptureRules:
     if state.isOver():
       game.gameOver = True
       if not game.rules.quiet:
-        redCount = 0
-        blueCount = 0
+        redCount = state.data.redReturned
+        blueCount = state.data.blueReturned
         foodToWin = (TOTAL_FOOD/2) - MIN_FOOD
-        for index in range(state.getNumAgents()):
-          agentState = state.data.agentStates[index]
-          if index in state.getRedTeamIndices():
-            redCount += agentState.numReturned
-          else:
-            blueCount += agentState.numReturned
-        
+
         if blueCount >= foodToWin:#state.getRedFood().count() == MIN_FOOD:
           print 'The Blue team has returned at least %d of the opponents\' dots.' % foodToWin
         elif redCount >= foodToWin:#state.getBlueFood().count() == MIN_FOOD:
@@ -404,8 +613,8 @@ class CaptureRules:
             print 'The %s team wins by %d points.' % (winner, abs(state.data.score))
 
   def getProgress(self, game):
-    blue = 1.0 - (game.state.getBlueFood().count() / float(self._initBlueFood))
-    red = 1.0 - (game.state.getRedFood().count() / float(self._initRedFood))
+    blue = 1.0 - (game.state.getBlueFoodCount() / float(self._initBlueFood))
+    red = 1.0 - (game.state.getRedFoodCount() / float(self._initRedFood))
     moves = len(self.moveHistory) / float(game.length)
 
     # return the most likely progress indicator, clamped to [0, 1]
@@ -444,8 +653,7 @@ class AgentRules:
     Returns a list of legal actions (which are both possible & allowed)
     """
     agentState = state.getAgentState(agentIndex)
-    conf = agentState.configuration
-    possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
+    possibleActions = state.data.layout.getActionTable().getPossibleActions( agentState.configuration )
     return AgentRules.filterForAllowedActions( agentState, possibleActions)
   getLegalActions = staticmethod( getLegalActions )
 
@@ -463,7 +671,7 @@ class AgentRules:
       raise Exception("Illegal action " + str(action))
 
     # Update Configuration
-    agentState = state.data.agentStates[agentIndex]
+    agentState = state.data.getMutableAgentState(agentIndex)
     speed = 1.0
     # if agentState.isPacman: speed = 0.5
     vector = Actions.directionToVector( action, speed )
@@ -485,19 +693,17 @@ class AgentRules:
         state.data.scoreChange += score
 
         agentState.numReturned += agentState.numCarrying
+        if isRed: state.data.redReturned += agentState.numCarrying
+        else: state.data.blueReturned += agentState.numCarrying
         agentState.numCarrying = 0
 
-        redCount = 0
-        blueCount = 0
-        for index in range(state.getNumAgents()):
-          agentState = state.data.agentStates[index]
-          if index in state.getRedTeamIndices():
-            redCount += agentState.numReturned
-          else:
-            blueCount += agentState.numReturned
-        if redCount >= (TOTAL_FOOD/2) - MIN_FOOD or blueCount >= (TOTAL_FOOD/2) - MIN_FOOD:
+        if state.data.redReturned >= (TOTAL_FOOD/2) - MIN_FOOD or state.data.blueReturned >= (TOTAL_FOOD/2) - MIN_FOOD:
           state.data._win = True
 
+        # The eating check below has always looked at the last agent's
+        # state after a return home; keep that so replays are unchanged
+        agentState = state.data.agentStates[-1]
+
 
     if agentState.isPacman and manhattanDistance( nearest, next ) <= 0.9 :
       AgentRules.consume( nearest, state, state.isOnRedTeam(agentIndex) )
@@ -518,16 +724,17 @@ class AgentRules:
         teamIndicesFunc = state.getRedTeamIndices
 
       # go increase the variable for the pacman who ate this
-      agents = [state.data.agentStates[agentIndex] for agentIndex in teamIndicesFunc()]
-      for agent in agents:
-        if agent.getPosition() == position:
-          agent.numCarrying += 1
+      for agentIndex in teamIndicesFunc():
+        if state.data.agentStates[agentIndex].getPosition() == position:
+          state.data.getMutableAgentState(agentIndex).numCarrying += 1
           break # the above should only be true for one agent...
 
       # do all the score and food grid maintainenace 
       #state.data.scoreChange += score
       state.data.food = state.data.food.copy()
       state.data.food[x][y] = False
+      if state.data.teamViews is not None:
+        state.data.teamViews = state.data.teamViews.setFood(x, y, False)
       state.data._foodEaten = position
       #if (isRed and state.getBlueFood().count() == MIN_FOOD) or (not isRed and state.getRedFood().count() == MIN_FOOD):
       #  state.data._win = True
@@ -536,21 +743,26 @@ class AgentRules:
     if isRed: myCapsules = state.getBlueCapsules()
     else: myCapsules = state.getRedCapsules()
     if( position in myCapsules ):
-      state.data.capsules.remove( position )
+      capsules = state.data.capsules[:]
+      capsules.remove( position )
+      state.data.capsules = capsules
+      if state.data.teamViews is not None:
+        state.data.teamViews = state.data.teamViews.removeCapsule( position )
       state.data._capsuleEaten = position
 
       # Reset all ghosts' scared timers
       if isRed: otherTeam = state.getBlueTeamIndices()
       else: otherTeam = state.getRedTeamIndices()
       for index in otherTeam:
-        state.data.agentStates[index].scaredTimer = SCARED_TIME
+        state.data.getMutableAgentState(index).scaredTimer = SCARED_TIME
 
   consume = staticmethod( consume )
 
   def decrementTimer(state):
     timer = state.scaredTimer
     if timer == 1:
-      state.configuration.pos = nearestPoint( state.configuration.pos )
+      # Configurations are shared between states, so replace rather than edit
+      state.configuration = Configuration( nearestPoint( state.configuration.pos ), state.configuration.direction )
     state.scaredTimer = max( 0, timer - 1 )
   decrementTimer = staticmethod( decrementTimer )
 
@@ -578,75 +790,47 @@ class AgentRules:
     scoreDirection = (-1)**(int(isRed) + 1)
     #state.data.scoreChange += scoreDirection * agentState.numCarrying
 
-    def onRightSide(state, x, y):
-      dummyConfig = Configuration((x, y), 'North')
-      return state.isRed(dummyConfig) == isRed
-
     # we have food to dump
-    # -- expand out in BFS. Check:
-    #   - that it's within the limits
-    #   - that it's not a wall
-    #   - that no other agents are there
-    #   - that no power pellets are there
-    #   - that it's on the right side of the grid
-    def allGood(state, x, y):
-      width, height = state.data.layout.width, state.data.layout.height
-      food, walls = state.data.food, state.data.layout.walls
-
-      # bounds check
-      if x >= width or y >= height or x <= 0 or y <= 0:
-        return False
-
-      if walls[x][y]:
-        return False
-      if food[x][y]:
-        return False
-
-      # dots need to be on the side where this agent will be a pacman :P
-      if not onRightSide(state, x, y):
-        return False
-
-      if (x,y) in state.data.capsules:
-        return False
-
-      # loop through agents
-      agentPoses = [state.getAgentPosition(i) for i in range(state.getNumAgents())]
-      if (x,y) in agentPoses:
-        return False
-
-      return True
+    # -- expand out in BFS over the 8-neighbourhood (diagonals included,
+    #    walls and all), placing dots on cells that are:
+    #   - within the limits and not a wall
+    #   - on the side where this agent was a pacman
+    #   - free of food, power pellets and agents
+    cells = getDumpCells(state.data.layout, isRed)
+    blocked = set(state.data.capsules)
+    for i in range(state.getNumAgents()):
+      blocked.add(state.getAgentPosition(i))
 
     numToDump = agentState.numCarrying
-    state.data.food = state.data.food.copy()
+    food = state.data.food = state.data.food.copy()
     foodAdded = []
 
-    def genSuccessors(x, y):
-      DX = [-1, 0, 1]
-      DY = [-1, 0, 1]
-      return [(x + dx, y + dy) for dx in DX for dy in DY]
-
-    # BFS graph search
-    positionQueue = [agentState.getPosition()]
-    seen = set()
+    start = agentState.getPosition()
+    startX, startY = int(start[0]), int(start[1])
+    maxDistance = max(state.data.layout.width, state.data.layout.height)
+    positionQueue = deque([start])
+    seen = set([start])
     while numToDump > 0:
-      if not len(positionQueue):
+      if not positionQueue:
         raise Exception('Exhausted BFS! uh oh')
-      # pop one off, graph check
-      popped = positionQueue.pop(0)
-      if popped in seen:
-        continue
-      seen.add(popped)
-
-      x, y = popped[0], popped[1]
-      x = int(x)
-      y = int(y)
-      if (allGood(state, x, y)):
-        state.data.food[x][y] = True
+      popped = positionQueue.popleft()
+      x, y = int(popped[0]), int(popped[1])
+      if max(abs(x - startX), abs(y - startY)) > maxDistance:
+        # Every cell on the board has been tried
+        raise Exception('Exhausted BFS! uh oh')
+      if (x, y) in cells and not food[x][y] and (x, y) not in blocked:
+        food[x][y] = True
+        if state.data.teamViews is not None:
+          state.data.teamViews = state.data.teamViews.setFood(x, y, True)
         foodAdded.append((x, y))
         numToDump -= 1
 
-      # generate successors
-      positionQueue = positionQueue + genSuccessors(x, y)
+      for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+          successor = (x + dx, y + dy)
+          if successor not in seen:
+            seen.add(successor)
+            positionQueue.append(successor)
 
     state.data._foodAdded = foodAdded
     # now our agentState is no longer carrying food
@@ -656,7 +840,7 @@ class AgentRules:
   dumpFoodFromDeath = staticmethod(dumpFoodFromDeath)
 
   def checkDeath( state, agentIndex):
-    agentState = state.data.agentStates[agentIndex]
+    agentState = state.data.getMutableAgentState(agentIndex)
     if state.isOnRedTeam(agentIndex):
       otherTeam = state.getBlueTeamIndices()
     else:
@@ -668,6 +852,7 @@ class AgentRules:
         ghostPosition = otherAgentState.getPosition()
         if ghostPosition == None: continue
         if manhattanDistance( ghostPosition, agentState.getPosition() ) <= COLLISION_TOLERANCE:
+          otherAgentState = state.data.getMutableAgentState(index)
           # award points to the other team for killing Pacmen
           if otherAgentState.scaredTimer <= 0:
             AgentRules.dumpFoodFromDeath(state, agentState, agentIndex)
@@ -694,6 +879,7 @@ class AgentRules:
         pacPos = otherAgentState.getPosition()
         if pacPos == None: continue
         if manhattanDistance( pacPos, agentState.getPosition() ) <= COLLISION_TOLERANCE:
+          otherAgentState = state.data.getMutableAgentState(index)
           #award points to the other team for killing Pacmen
           if agentState.scaredTimer <= 0:
             AgentRules.dumpFoodFromDeath(state, otherAgentState, agentIndex)
@@ -751,6 +937,10 @@ def readCommand( argv ):
                   - starts a two-player interactive game where the arrow keys control agent 0, and all other agents are baseline agents
               (3) python capture.py -r baselineTeam -b myTeam
                   - starts a fully automated game where the red team is a baseline team and blue team is myTeam
+              (4) python capture.py -r baselineTeam -b myTeam -n 1000 --workers 8
+                  - plays 1000 games without graphics on 8 processes and prints the summary
+                    (with --workers every game gets its own seed, so results repeat for any
+                    number of workers but differ from a run without --workers)
   """
   parser = OptionParser(usageStr)
 
@@ -798,6 +988,10 @@ def readCommand( argv ):
                     help=default('How many episodes are training (suppresses output)'), default=0)
   parser.add_option('-c', '--catchExceptions', action='store_true', default=False,
                     help='Catch exceptions and enforce time limits')
+  parser.add_option('--workers', type='int', default=None,
+                    help='Number of processes to play the games on, without graphics.  Each game '
+                         'is seeded on its own, so with -f the results are the same for any number '
+                         'of workers, but not the same as without --workers')
 
   options, otherjunk = parser.parse_args(argv)
   assert len(otherjunk) == 0, "Unrecognized options: " + str(otherjunk)
@@ -817,6 +1011,10 @@ def readCommand( argv ):
     import textDisplay
     args['display'] = textDisplay.NullGraphics()
     args['muteAgents'] = True
+  elif options.workers is not None:
+    # Games played in worker processes have no display
+    import textDisplay
+    args['display'] = textDisplay.NullGraphics()
   else:
     import captureGraphicsDisplay
     # Hack for agents writing to the display
@@ -846,11 +1044,22 @@ def readCommand( argv ):
     redArgs['numTraining'] = options.numTraining
     blueArgs['numTraining'] = options.numTraining
   nokeyboard = options.textgraphics or options.quiet or options.numTraining > 0
-  print '\nRed team %s with %s:' % (options.red, redArgs)
-  redAgents = loadAgents(True, options.red, nokeyboard, redArgs)
-  print '\nBlue team %s with %s:' % (options.blue, blueArgs)
-  blueAgents = loadAgents(False, options.blue, nokeyboard, blueArgs)
-  args['agents'] = sum([list(el) for el in zip(redAgents, blueAgents)],[]) # list of agents
+  if options.workers is not None:
+    if options.workers < 1:
+      raise Exception('--workers must be at least 1')
+    if options.numTraining > 0 or True in [options.keys0, options.keys1, options.keys2, options.keys3]:
+      raise Exception('Training games and keyboard agents cannot be used with --workers')
+    # Each worker process loads the teams itself
+    print '\nRed team %s with %s:' % (options.red, redArgs)
+    print '\nBlue team %s with %s:' % (options.blue, blueArgs)
+    args['teams'] = (options.red, options.blue, redArgs, blueArgs)
+    args['workers'] = options.workers
+  else:
+    print '\nRed team %s with %s:' % (options.red, redArgs)
+    redAgents = loadAgents(True, options.red, nokeyboard, redArgs)
+    print '\nBlue team %s with %s:' % (options.blue, blueArgs)
+    blueAgents = loadAgents(False, options.blue, nokeyboard, blueArgs)
+    args['agents'] = sum([list(el) for el in zip(redAgents, blueAgents)],[]) # list of agents
 
   numKeyboardAgents = 0
   for index, val in enumerate([options.keys0, options.keys1, options.keys2, options.keys3]):
@@ -886,6 +1095,8 @@ def readCommand( argv ):
   args['numTraining'] = options.numTraining
   args['record'] = options.record
   args['catchExceptions'] = options.catchExceptions
+  if options.workers is not None:
+    del args['display'], args['numTraining']
   return args
 
 def randomLayout(seed = None):
@@ -974,30 +1185,100 @@ def runGames( layouts, agents, display, length, numGames, record, numTraining, r
 
     g.record = None
     if record:
-      import time, cPickle, game
-      #fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-      #f = file(fname, 'w')
-      components = {'layout': layout, 'agents': [game.Agent() for a in agents], 'actions': g.moveHistory, 'length': length, 'redTeamName': redTeamName, 'blueTeamName':blueTeamName }
-      #f.close()
-      print "recorded"
-      g.record = cPickle.dumps(components)
-      with open('replay-%d'%i,'wb') as f:
-        f.write(g.record)
+      g.record = recordGame(i, layout, len(agents), g.moveHistory, length, redTeamName, blueTeamName)
 
   if numGames > 1:
-    scores = [game.state.data.score for game in games]
-    redWinRate = [s > 0 for s in scores].count(True)/ float(len(scores))
-    blueWinRate = [s < 0 for s in scores].count(True)/ float(len(scores))
-    print 'Average Score:', sum(scores) / float(len(scores))
-    print 'Scores:       ', ', '.join([str(score) for score in scores])
-    print 'Red Win Rate:  %d/%d (%.2f)' % ([s > 0 for s in scores].count(True), len(scores), redWinRate)
-    print 'Blue Win Rate: %d/%d (%.2f)' % ([s < 0 for s in scores].count(True), len(scores), blueWinRate)
-    print 'Record:       ', ', '.join([('Blue', 'Tie', 'Red')[max(0, min(2, 1 + s))] for s in scores])
+    printSummary([game.state.data.score for game in games])
   return games
 
-def save_score(game):
+def recordGame( i, layout, numAgents, moveHistory, length, redTeamName, blueTeamName ):
+  "Writes the history of game i to replay-i for --replay; returns the pickled record"
+  import time, cPickle, game
+  #fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
+  #f = file(fname, 'w')
+  components = {'layout': layout, 'agents': [game.Agent() for a in range(numAgents)], 'actions': moveHistory, 'length': length, 'redTeamName': redTeamName, 'blueTeamName':blueTeamName }
+  #f.close()
+  print "recorded"
+  record = cPickle.dumps(components)
+  with open('replay-%d'%i,'wb') as f:
+    f.write(record)
+  return record
+
+def printSummary( scores ):
+  "Prints the average score, win rates and record of a series of games"
+  redWinRate = [s > 0 for s in scores].count(True)/ float(len(scores))
+  blueWinRate = [s < 0 for s in scores].count(True)/ float(len(scores))
+  print 'Average Score:', sum(scores) / float(len(scores))
+  print 'Scores:       ', ', '.join([str(score) for score in scores])
+  print 'Red Win Rate:  %d/%d (%.2f)' % ([s > 0 for s in scores].count(True), len(scores), redWinRate)
+  print 'Blue Win Rate: %d/%d (%.2f)' % ([s < 0 for s in scores].count(True), len(scores), blueWinRate)
+  print 'Record:       ', ', '.join([('Blue', 'Tie', 'Red')[max(0, min(2, 1 + s))] for s in scores])
+
+# The teams of the worker process, loaded once by initWorker
+WORKER_AGENTS = None
+
+def initWorker( teams ):
+  "Loads the (red, blue, redArgs, blueArgs) teams in a worker process of runGamesInParallel"
+  global WORKER_AGENTS
+  red, blue, redArgs, blueArgs = teams
+  util.mutePrint()
+  redAgents = loadAgents(True, red, True, redArgs)
+  blueAgents = loadAgents(False, blue, True, blueArgs)
+  util.unmutePrint()
+  WORKER_AGENTS = sum([list(el) for el in zip(redAgents, blueAgents)],[])
+
+def playWorkerGame( task ):
+  "Plays one game in a worker process; returns its score and move history"
+  layoutText, seed, length, muteAgents, catchExceptions = task
+  import layout, textDisplay
+  random.seed(seed)
+  rules = CaptureRules(quiet = True)
+  g = rules.newGame( layout.Layout(list(layoutText)), WORKER_AGENTS, textDisplay.NullGraphics(), length, muteAgents, catchExceptions )
+  g.run()
+  return g.state.data.score, g.moveHistory
+
+def runGamesInParallel( layouts, teams, workers, length, numGames, record, redTeamName, blueTeamName, muteAgents=False, catchExceptions=False ):
+  """
+  Plays the games runGames would on a pool of worker processes, each of
+  which loads the teams once.  Every game gets its own random seed, drawn
+  here in order so that --fixRandomSeed repeats a whole run whatever the
+  number of workers; with one worker the games are played in this process.
+  The seeding differs from runGames, which plays all games from one random
+  stream, so the scores are not comparable game for game with a run
+  without --workers.  Prints the same summary as runGames and returns the
+  scores in game order.
+  """
+  import multiprocessing, itertools
+  tasks = [(layouts[i].layoutText, random.randint(0, sys.maxint), length, muteAgents, catchExceptions)
+           for i in range(numGames)]
+  print 'Playing %d games on %d workers' % (numGames, workers)
+  if workers > 1:
+    pool = multiprocessing.Pool(workers, initWorker, (teams,))
+    played = pool.imap(playWorkerGame, tasks)
+  else:
+    pool = None
+    initWorker(teams)
+    played = itertools.imap(playWorkerGame, tasks)
+  scores = []
+  try:
+    for i, (score, moveHistory) in enumerate(played):
+      scores.append(score)
+      if record:
+        recordGame(i, layouts[i], 4, moveHistory, length, redTeamName, blueTeamName)
+  except:
+    if pool is not None: pool.terminate()
+    raise
+  if pool is not None:
+    pool.close()
+    pool.join()
+
+  if numGames > 1:
+    printSummary(scores)
+  return scores
+
+def save_score(score):
     with open('score', 'w') as f:
-        print >>f, game.state.data.score
+        print >>f, score
 
 if __name__ == '__main__':
   """
@@ -1011,8 +1292,11 @@ if __name__ == '__main__':
   > python capture.py --help
   """
   options = readCommand( sys.argv[1:] ) # Get game components based on input
-  games = runGames(**options)
-
-  save_score(games[0])
+  if 'workers' in options:
+    scores = runGamesInParallel(**options)
+    save_score(scores[0])
+  else:
+    games = runGames(**options)
+    save_score(games[0].state.data.score)
   # import cProfile
   # cProfile.run('runGames( **options )', 'profile')
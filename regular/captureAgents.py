@@ -55,7 +55,7 @@ class CaptureAgent(Agent):
   # Methods to store key info #
   #############################
 
-  def __init__( self, index, timeForComputing = .1 ):
+  def __init__( self, index, timeForComputing = .1, incrementalDistances = False ):
     """
     Lists several variables you can query:
     self.index = index for this agent
@@ -64,8 +64,15 @@ class CaptureAgent(Agent):
     self.distancer = distance calculator (contest code provides this)
     self.observationHistory = list of GameState objects that correspond
         to the sequential order of states that have occurred so far this game
+    self.successorMemo, self.featureMemo = what getSuccessor and getCachedFeatures
+        have built this turn, keyed by (id(gameState), action); cleared by getAction
+    self.deadline = the game.TurnDeadline of the current turn (None outside a game);
+        anytime searches in chooseAction can run until self.deadline.timeLeft() nears 0
     self.timeForComputing = an amount of time to give each turn for computing maze distances
         (part of the provided distance calculator)
+    self.incrementalDistances = if true, maze distances are computed timeForComputing seconds
+        at a time (at startup and then each turn) instead of all at once in registerInitialState;
+        until they are done, getMazeDistance falls back to Manhattan distance where needed
     """
     # Agent index for querying state
     self.index = index
@@ -82,9 +89,19 @@ class CaptureAgent(Agent):
     # A history of observations
     self.observationHistory = []
 
+    # Successors and features built this turn
+    self.successorMemo = {}
+    self.featureMemo = {}
+
+    # Time budget of the current turn, set by the game
+    self.deadline = None
+
     # Time to spend each turn on computing maze distances
     self.timeForComputing = timeForComputing
 
+    # Whether to spread the maze distance computation over several turns
+    self.incrementalDistances = incrementalDistances
+
     # Access to the graphics
     self.display = None
 
@@ -102,7 +119,10 @@ class CaptureAgent(Agent):
     self.distancer = distanceCalculator.Distancer(gameState.data.layout)
 
     # comment this out to forgo maze distance computation and use manhattan distances
-    self.distancer.getMazeDistances()
+    if self.incrementalDistances:
+      self.distancer.getMazeDistances(self.timeForComputing)
+    else:
+      self.distancer.getMazeDistances()
 
     import __main__
     if '_display' in dir(__main__):
@@ -122,6 +142,26 @@ class CaptureAgent(Agent):
     " Changing this won't affect pacclient.py, but will affect capture.py "
     return gameState.makeObservation(self.index)
 
+  def observationIsPrivate(self):
+    """
+    True if observationFunction returns a fresh copy and leaves the state it
+    is given alone, so the game can hand it the game's own state instead of
+    a copy.  That holds for the method above; subclasses that override
+    observationFunction are handed a copy unless they override this too.
+    """
+    return self.observationFunction.im_func is CaptureAgent.observationFunction.im_func
+
+  def setDeadline(self, deadline):
+    "Called by the game at the start of each turn with its game.TurnDeadline"
+    self.deadline = deadline
+
+  def getDeadline(self):
+    """
+    Returns the game.TurnDeadline of this turn, or None outside a game.
+    deadline.timeLeft() is the time left before the move costs a warning.
+    """
+    return self.deadline
+
   def debugDraw(self, cells, color, clear=False):
 
     if self.display:
@@ -152,6 +192,11 @@ class CaptureAgent(Agent):
 
     """
     self.observationHistory.append(gameState)
+    self.successorMemo.clear()
+    self.featureMemo.clear()
+
+    if self.distancer.isComputingMazeDistances():
+      self.distancer.getMazeDistances(self.timeForComputing)
 
     myState = gameState.getAgentState(self.index)
     myPos = myState.getPosition()
@@ -172,6 +217,39 @@ class CaptureAgent(Agent):
   # Convenience Methods #
   #######################
 
+  def getSuccessor(self, gameState, action):
+    """
+    Finds the next successor which is a grid position (location tuple).
+
+    Each (gameState, action) is expanded only once per turn, so evaluation
+    code can ask for the same successor as often as it likes.  Treat the
+    result as read-only.
+    """
+    key = (id(gameState), action)
+    entry = self.successorMemo.get(key)
+    # The memo holds on to gameState, so its id cannot be reused this turn
+    if entry is None or entry[0] is not gameState:
+      successor = gameState.generateSuccessor(self.index, action)
+      pos = successor.getAgentState(self.index).getPosition()
+      if pos != nearestPoint(pos):
+        # Only half a grid position was covered
+        successor = successor.generateSuccessor(self.index, action)
+      entry = self.successorMemo[key] = (gameState, successor)
+    return entry[1]
+
+  def getCachedFeatures(self, gameState, action):
+    """
+    Returns self.getFeatures(gameState, action), computing it only once per
+    turn.  Subclasses that define getFeatures can use this from evaluate
+    and anywhere else the same features are needed; treat the result as
+    read-only.
+    """
+    key = (id(gameState), action)
+    entry = self.featureMemo.get(key)
+    if entry is None or entry[0] is not gameState:
+      entry = self.featureMemo[key] = (gameState, self.getFeatures(gameState, action))
+    return entry[1]
+
   def getFood(self, gameState):
     """
     Returns the food you're meant to eat. This is in the form of a matrix
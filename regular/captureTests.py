@@ -0,0 +1,234 @@
+# captureTests.py
+# ---------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Regression checks for the capture engine.  Run them with:
+
+  python captureTests.py
+"""
+
+import random, unittest
+import capture, layout, util
+import baselineTeam
+from captureAgents import CaptureAgent
+from game import Configuration, Directions, Grid, BitGrid
+
+def newState( layoutName='tinyCapture' ):
+  state = capture.GameState()
+  state.initialize(layout.getLayout(layoutName), 4)
+  state.data.timeleft = 1200
+  return state
+
+def snapshot( state ):
+  "Everything about a state that a move can change, as plain values"
+  data = state.data
+  agents = [(a.configuration.pos, a.configuration.direction, a.isPacman, a.scaredTimer,
+             a.numCarrying, a.numReturned) for a in data.agentStates]
+  return (data.score, data.redReturned, data.blueReturned, data.timeleft,
+          data.food.asList(), list(data.capsules), agents,
+          data._win, data._lose, state.getZobristKey())
+
+class SearchStateTest(unittest.TestCase):
+
+  def testUndoReturnHome(self):
+    "Undoing a move that carries food home restores the returned totals"
+    state = newState()
+    # Red agent 0 stands just over the border carrying three dots
+    agentState = state.data.getMutableAgentState(0)
+    agentState.configuration = Configuration((10, 3), Directions.WEST)
+    agentState.isPacman = True
+    agentState.numCarrying = 3
+    state.data._zobristKey = None
+
+    searchState = capture.SearchState(state)
+    before = snapshot(searchState)
+    token = searchState.apply(0, Directions.WEST)
+    self.assertEqual(searchState.data.redReturned, 3)
+    self.assertEqual(searchState.getAgentState(0).numReturned, 3)
+    searchState.undo(token)
+    self.assertEqual(snapshot(searchState), before)
+
+  def testUndoRandomWalk(self):
+    "apply/undo matches generateSuccessor, and undo restores every field"
+    rand = random.Random(0)
+    for layoutName in ['tinyCapture', 'defaultCapture']:
+      state = newState(layoutName)
+      searchState = capture.SearchState(state)
+      agentIndex = 0
+      tokens = []
+      for step in range(300):
+        if state.isOver(): break
+        action = rand.choice(state.getLegalActions(agentIndex))
+        successor = state.generateSuccessor(agentIndex, action)
+        before = snapshot(searchState)
+        tokens.append((searchState.apply(agentIndex, action), before))
+        self.assertEqual(snapshot(searchState), snapshot(successor))
+        state = successor
+        agentIndex = (agentIndex + 1) % 4
+      for token, before in reversed(tokens):
+        searchState.undo(token)
+        self.assertEqual(snapshot(searchState), before)
+
+def tamper( state ):
+  "Tries every way an agent might change a state it was handed"
+  data = state.data
+  for agentState in data.agentStates:
+    agentState.numCarrying = agentState.scaredTimer = agentState.numReturned = 99
+    agentState.start.pos = (99, 99)
+    if agentState.configuration is not None:
+      agentState.configuration.pos = (99, 99)
+      agentState.configuration.direction = Directions.STOP
+  attempts = [lambda: data.food[1].__setitem__(1, True),
+              lambda: data.capsules.append((1, 1)),
+              lambda: data.teamViews.redFood[1].__setitem__(1, True),
+              lambda: data.teamViews.redCapsules.append((1, 1)),
+              lambda: data.layout.walls[1].__setitem__(1, True),
+              lambda: setattr(data.layout, 'walls', None),
+              lambda: setattr(data.layout, 'agentPositions', ())]
+  for attempt in attempts:
+    try:
+      attempt()
+    except (TypeError, AttributeError):
+      pass
+  if data.teamViews is not None:
+    data.teamViews.redFood = data.teamViews.blueFood = None
+    data.teamViews.redFoodCount = data.teamViews.blueFoodCount = 0
+    data.teamViews.redCapsules = data.teamViews.blueCapsules = []
+  data.score = 1000
+  state.blueTeam.append(7)
+  state.redTeam.append(7)
+
+class Vandal(baselineTeam.OffensiveReflexAgent):
+  "Tampers with everything it is handed, then plays like its parent"
+  def observationFunction(self, gameState):
+    observation = CaptureAgent.observationFunction(self, gameState)
+    tamper(observation)
+    return CaptureAgent.observationFunction(self, gameState)
+
+  def registerInitialState(self, gameState):
+    baselineTeam.OffensiveReflexAgent.registerInitialState(self, gameState)
+    tamper(gameState)
+
+  def chooseAction(self, gameState):
+    action = baselineTeam.OffensiveReflexAgent.chooseAction(self, gameState)
+    tamper(gameState)
+    return action
+
+class AgentViewTest(unittest.TestCase):
+
+  def testObservationIsolated(self):
+    "Changing an observation leaves the state it was made from alone"
+    state = newState()
+    walls = state.data.layout.walls
+    before = snapshot(state)
+    starts = [a.start.pos for a in state.data.agentStates]
+    for index in range(4):
+      tamper(state.makeObservation(index))
+    self.assertEqual(snapshot(state), before)
+    self.assertEqual([a.start.pos for a in state.data.agentStates], starts)
+    self.assertTrue(state.data.layout.walls is walls)
+    self.assertEqual(state.getRedFood().count(), state.data.teamViews.redFoodCount)
+    self.assertEqual(len(state.redTeam), 2)
+
+  def testDeepCopyAccessorsFollowEdits(self):
+    "The team accessors of a deepCopy reflect edits to its food and capsules"
+    state = newState('defaultCapture')
+    copy = state.deepCopy()
+    x, y = state.getRedFood().asList()[0]
+    copy.data.food[x][y] = False
+    copy.data.capsules.remove(state.getBlueCapsules()[0])
+    self.assertFalse(copy.getRedFood()[x][y])
+    self.assertEqual(copy.getRedFoodCount() + copy.getBlueFoodCount(), copy.data.food.count())
+    self.assertEqual(len(copy.getBlueCapsules()), len(state.getBlueCapsules()) - 1)
+    self.assertTrue(state.getRedFood()[x][y])
+    self.assertEqual(state.getRedFoodCount() + state.getBlueFoodCount(), state.data.food.count())
+
+  def testDeepCopyIsolated(self):
+    "Tampering with a deepCopy (as registerInitialState gets) leaves the state alone"
+    state = newState('defaultCapture')
+    before = snapshot(state)
+    counts = (state.getRedFoodCount(), state.getBlueFoodCount())
+    capsules = (state.getRedCapsules(), state.getBlueCapsules())
+    tamper(state.deepCopy())
+    self.assertEqual(snapshot(state), before)
+    self.assertEqual((state.getRedFoodCount(), state.getBlueFoodCount()), counts)
+    self.assertEqual((state.getRedCapsules(), state.getBlueCapsules()), capsules)
+
+  def testOneViewPerMove(self):
+    "A stock CaptureAgent's observation is the only copy made for its move"
+    makeAgentView = capture.GameState.makeAgentView
+    calls = []
+    def countingView(state):
+      calls.append(1)
+      return makeAgentView(state)
+    capture.GameState.makeAgentView = countingView
+    try:
+      random.seed(1)
+      args = capture.readCommand(['-l', 'tinyCapture', '-q', '-i', '100'])
+      util.mutePrint()
+      try:
+        game = capture.runGames(**args)[0]
+      finally:
+        util.unmutePrint()
+    finally:
+      capture.GameState.makeAgentView = makeAgentView
+    self.assertEqual(len(calls), len(game.moveHistory))
+
+  def testLayoutImmutable(self):
+    l = layout.getLayout('tinyCapture')
+    self.assertRaises(AttributeError, setattr, l, 'walls', None)
+    self.assertRaises(TypeError, l.walls[1].__setitem__, 1, True)
+
+  def testVandalCannotCorruptGame(self):
+    "A game with a tampering agent plays out exactly like one without"
+    results = []
+    for vandal in (False, True):
+      random.seed(1)
+      args = capture.readCommand(['-l', 'tinyCapture', '-q', '-i', '200'])
+      if vandal:
+        args['agents'][0] = Vandal(0)
+      util.mutePrint()
+      try:
+        game = capture.runGames(**args)[0]
+      finally:
+        util.unmutePrint()
+      results.append((game.moveHistory, game.state.data.score))
+    self.assertEqual(results[0], results[1])
+
+class GridTest(unittest.TestCase):
+
+  def testGridEqualsBitGrid(self):
+    "A list-backed Grid and a BitGrid compare the same either way round"
+    food = newState().getRedFood()
+    grid = Grid(food.width, food.height)
+    for x, y in food.asList():
+      grid[x][y] = True
+    self.assertTrue(grid == food and food == grid)
+    self.assertFalse(grid != food or food != grid)
+    grid[0][0] = True
+    self.assertFalse(grid == food or food == grid)
+
+class TopologyTest(unittest.TestCase):
+
+  def testSharedResultsReadOnly(self):
+    "The topology index is shared process-wide, so its results cannot be edited"
+    topology = layout.getLayout('defaultCapture').getTopology()
+    border = topology.getHomeBorder(True)
+    self.assertRaises(AttributeError, getattr, border, 'append')
+    self.assertRaises(AttributeError, getattr, topology.getNeighbors(border[0]), 'sort')
+    corridor = topology.getCorridor(topology.corridors[0][0])
+    self.assertRaises(AttributeError, getattr, corridor, 'reverse')
+
+if __name__ == '__main__':
+  unittest.main()
@@ -21,7 +21,8 @@ distancer = Distancer(gameState.data.layout)
 distancer.getDistance( (1,1), (10,10) )
 """
 
-import sys, time, random
+import sys, os, time, random, struct, mmap, ctypes
+from array import array
 
 class Distancer:
   def __init__(self, layout, default = 10000):
@@ -29,40 +30,147 @@ class Distancer:
     Initialize with Distancer(layout).  Changing default is unnecessary.
     """
     self._distances = None
+    self._partial = None
     self.default = default
     self.dc = DistanceCalculator(layout, self, default)
 
-  def getMazeDistances(self):
-    self.dc.run()
+  def getMazeDistances(self, timeLimit = None):
+    """
+    Computes the maze distances.  With a timeLimit (in seconds) only as many
+    BFS sources as fit in the budget are processed; call again on a later
+    turn to resume.  Returns True once every distance is available.
+    """
+    return self.dc.run(timeLimit)
 
   def getDistance(self, pos1, pos2):
     """
     The getDistance function is the only one you'll need after you create the object.
     """
-    if self._distances == None:
+    if self._distances is None:
+      if self._partial is not None:
+        return self.getPartialDistance(pos1, pos2)[0]
       return manhattanDistance(pos1, pos2)
     if isInt(pos1) and isInt(pos2):
       return self.getDistanceOnGrid(pos1, pos2)
-    pos1Grids = getGrids2D(pos1)
-    pos2Grids = getGrids2D(pos2)
-    bestDistance = self.default
+    table = self._distances
+    lookup = table.lookup
+    pos2Snaps = table.getSnaps(pos2)
+    return min([self.default] +
+               [lookup(i, j) + snap1Distance + snap2Distance
+                for i, snap1Distance in table.getSnaps(pos1)
+                for j, snap2Distance in pos2Snaps])
+
+  def getDistanceOnGrid(self, pos1, pos2):
+    index = self._distances.index
+    if pos1 in index and pos2 in index:
+      return self._distances.lookup(index[pos1], index[pos2])
+    else:
+      raise Exception("Positions not in grid: " + str((pos1, pos2)))
+
+  def getDistanceAndType(self, pos1, pos2):
+    """
+    Like getDistance, but returns a (distance, isMazeDistance) pair telling
+    whether a maze distance or the Manhattan fallback was used.
+    """
+    if self._distances is not None:
+      return self.getDistance(pos1, pos2), True
+    if self._partial is not None:
+      return self.getPartialDistance(pos1, pos2)
+    return manhattanDistance(pos1, pos2), False
+
+  def getPartialDistance(self, pos1, pos2):
+    """
+    While distances are being computed incrementally, answers from the BFS
+    sources finished so far and uses Manhattan distance for the rest.
+    """
+    table = self._partial
+    index = table.index
+    isMaze = True
+    if isInt(pos1) and isInt(pos2):
+      pos1Grids = [(pos1, 0)]
+      pos2Grids = [(pos2, 0)]
+      bestDistance = None
+    else:
+      pos1Grids = getGrids2D(pos1)
+      pos2Grids = getGrids2D(pos2)
+      bestDistance = self.default
     for pos1Snap, snap1Distance in pos1Grids:
       for pos2Snap, snap2Distance in pos2Grids:
-        gridDistance = self.getDistanceOnGrid(pos1Snap, pos2Snap)
+        if pos1Snap not in index or pos2Snap not in index:
+          raise Exception("Positions not in grid: " + str((pos1Snap, pos2Snap)))
+        gridDistance = table.lookup(index[pos1Snap], index[pos2Snap])
+        if gridDistance is None:
+          gridDistance = manhattanDistance(pos1Snap, pos2Snap)
+          isMaze = False
         distance = gridDistance + snap1Distance + snap2Distance
-        if bestDistance > distance:
+        if bestDistance is None or bestDistance > distance:
           bestDistance = distance
-    return bestDistance
+    return bestDistance, isMaze
 
-  def getDistanceOnGrid(self, pos1, pos2):
-    key = (pos1, pos2)
-    if key in self._distances:
-      return self._distances[key]
-    else:
-      raise Exception("Positions not in grid: " + str(key))
+  def getLazyMazeDistances(self, maxRows = 256):
+    """
+    Switches to on-demand maze distances: a source cell's BFS runs the first
+    time it is queried and at most maxRows rows are kept (least recently
+    used first out).  A full table already computed in this process is
+    used instead when available.
+    """
+    self.dc.runLazy(maxRows)
+
+  def getRowCacheStats(self):
+    "Returns (hits, misses, rowsHeld) for the lazy row cache, or None"
+    table = self._distances
+    if not isinstance(table, LazyDistanceTable):
+      return None
+    return table.hits, table.misses, len(table.rows)
+
+  def distancesFrom(self, pos, targets):
+    """
+    Returns the list of distances from pos to each position in targets.
+    When pos and the targets are grid cells this is a single pass over
+    one row of the distance table.
+    """
+    table = self._distances
+    if table is not None and pos in table.index:
+      index = table.index
+      lookup = table.lookup
+      i = index[pos]
+      try:
+        return [lookup(i, index[target]) for target in targets]
+      except KeyError:
+        pass
+    return [self.getDistance(pos, target) for target in targets]
+
+  def nearest(self, pos, targets):
+    """
+    Returns a (distance, target) pair for the target closest to pos, taking
+    the first one listed on ties, or None if targets is empty.
+    """
+    best = None
+    for distance, target in zip(self.distancesFrom(pos, targets), targets):
+      if best is None or distance < best[0]:
+        best = (distance, target)
+    return best
+
+  def getDistanceField(self, targets):
+    """
+    Returns a DistanceField giving, for any position, the maze distance to
+    the nearest cell in targets (e.g. your home border).  Fields are built
+    with one multi-source BFS and cached per target set, so build them for
+    sets that stay fixed over many turns.
+    """
+    table = self._distances
+    if table is None:
+      table = self._partial
+    if table is None:
+      table = self.dc.getGraph()
+    return table.getField(targets)
 
   def isReadyForMazeDistance(self):
-    return self._distances != None
+    return self._distances is not None
+
+  def isComputingMazeDistances(self):
+    "True while an incremental computation has been started but not finished"
+    return self._partial is not None
 
 def manhattanDistance(x, y ):
   return abs( x[0] - y[0] ) + abs( x[1] - y[1] )
@@ -88,65 +196,264 @@ def getGrids1D(x):
 # MACHINERY FOR COMPUTING MAZE DISTANCES #
 ##########################################
 
+# Process-wide registries, keyed by Layout.getWallFingerprint(), so every
+# agent in every game played by this process shares one table per maze.
 distanceMap = {}
+partialMap = {}
 
 class DistanceCalculator:
   def __init__(self, layout, distancer, default = 10000):
     self.layout = layout
     self.distancer = distancer
     self.default = default
+    self.graph = None
+
+  def run(self, timeLimit = None):
+    global distanceMap, partialMap
+
+    key = self.layout.getWallFingerprint()
+    if key not in distanceMap:
+      partial = partialMap.get(key)
+      if partial is None and timeLimit is None:
+        distanceMap[key] = loadOrComputeDistances(self.layout)
+      else:
+        if partial is None:
+          distances = loadCachedDistances(self.layout)
+          if distances is None:
+            partial = partialMap[key] = PartialDistanceTable(self.layout)
+          else:
+            distanceMap[key] = distances
+        if partial is not None:
+          if not partial.compute(timeLimit):
+            self.distancer._partial = partial
+            return False
+          distances = DistanceTable(partial.cells, partial.distances)
+          distanceMap[key] = distances
+          del partialMap[key]
+          saveCachedDistances(self.layout, distances)
 
-  def run(self):
-    global distanceMap
+    self.distancer._distances = distanceMap[key]
+    self.distancer._partial = None
+    return True
 
-    if self.layout.walls not in distanceMap:
-      distances = computeDistances(self.layout)
-      distanceMap[self.layout.walls] = distances
+  def getGraph(self):
+    "Returns a DistanceTable holding just the cells and their adjacency"
+    if self.graph is None:
+      cells = self.layout.walls.asList(False)
+      self.graph = DistanceTable(cells, None)
+    return self.graph
+
+  def runLazy(self, maxRows):
+    key = self.layout.getWallFingerprint()
+    if key in distanceMap:
+      self.distancer._distances = distanceMap[key]
     else:
-      distances = distanceMap[self.layout.walls]
+      self.distancer._distances = LazyDistanceTable(self.layout, maxRows)
+    self.distancer._partial = None
+
+UNREACHABLE = 0xFFFF # Stored for pairs in disconnected regions of the maze
+
+class DistanceTable:
+  """
+  All-pairs maze distances in a dense, cell-indexed matrix.
+
+  Every non-wall cell gets an index (see self.index) and the distance
+  from cell i to cell j is stored at distances[i * numCells + j] in an
+  array of unsigned shorts.
+  """
+  def __init__(self, cells, distances, neighbors = None):
+    self.cells = cells
+    self.numCells = len(cells)
+    self.index = dict((cell, i) for i, cell in enumerate(cells))
+    self.distances = distances
+    self.neighbors = neighbors
+    self.snapCache = {}
+    self.fields = {}
 
-    self.distancer._distances = distances
+  def lookup(self, i, j):
+    distance = self.distances[i * self.numCells + j]
+    if distance == UNREACHABLE:
+      return sys.maxint
+    return distance
+
+  def getSnaps(self, pos):
+    """
+    Returns a list of (cellIndex, snapDistance) pairs for the grid cells a
+    (possibly fractional) position snaps to.  Memoized per position.
+    """
+    snaps = self.snapCache.get(pos)
+    if snaps is None:
+      snaps = []
+      for snap, snapDistance in getGrids2D(pos):
+        if snap not in self.index:
+          raise Exception("Positions not in grid: " + str(snap))
+        snaps.append((self.index[snap], snapDistance))
+      self.snapCache[pos] = snaps
+    return snaps
+
+  def getNeighbors(self):
+    if self.neighbors is None:
+      self.neighbors = getNeighborIndices(self.cells, self.index)
+    return self.neighbors
+
+  def getField(self, targets):
+    key = frozenset(targets)
+    if key not in self.fields:
+      if len(self.fields) >= MAX_FIELDS:
+        self.fields.clear()
+      self.fields[key] = DistanceField(self, key)
+    return self.fields[key]
+
+  def __contains__(self, key):
+    pos1, pos2 = key
+    return pos1 in self.index and pos2 in self.index
+
+  def __getitem__(self, key):
+    pos1, pos2 = key
+    return self.lookup(self.index[pos1], self.index[pos2])
+
+def getNeighborIndices(cells, index):
+  "Returns, for each cell index, the indices of its non-wall neighbors"
+  neighbors = []
+  for x, y in cells:
+    adjacent = [(x,y+1), (x,y-1), (x+1,y), (x-1,y)]
+    neighbors.append([index[other] for other in adjacent if other in index])
+  return neighbors
 
 def computeDistances(layout):
-    "Runs UCS to all other positions from each position"
-    distances = {}
-    allNodes = layout.walls.asList(False)
-    for source in allNodes:
-        dist = {}
-        closed = {}
-        for node in allNodes:
-            dist[node] = sys.maxint
-        import util
-        queue = util.PriorityQueue()
-        queue.push(source, 0)
-        dist[source] = 0
-        while not queue.isEmpty():
-            node = queue.pop()
-            if node in closed:
-                continue
-            closed[node] = True
-            nodeDist = dist[node]
-            adjacent = []
-            x, y = node
-            if not layout.isWall((x,y+1)):
-                adjacent.append((x,y+1))
-            if not layout.isWall((x,y-1)):
-                adjacent.append((x,y-1) )
-            if not layout.isWall((x+1,y)):
-                adjacent.append((x+1,y) )
-            if not layout.isWall((x-1,y)):
-                adjacent.append((x-1,y))
-            for other in adjacent:
-                if not other in dist:
-                    continue
-                oldDist = dist[other]
-                newDist = nodeDist+1
-                if newDist < oldDist:
-                    dist[other] = newDist
-                    queue.push(other, newDist)
-        for target in allNodes:
-            distances[(target, source)] = dist[target]
-    return distances
+  "Runs BFS to all other positions from each position"
+  cells = layout.walls.asList(False)
+  numCells = len(cells)
+  index = dict((cell, i) for i, cell in enumerate(cells))
+  neighbors = getNeighborIndices(cells, index)
+  distances = array('H', [UNREACHABLE]) * (numCells * numCells)
+  for source in range(numCells):
+    computeRow(distances, neighbors, [source], source * numCells)
+  return DistanceTable(cells, distances, neighbors)
+
+class PartialDistanceTable(DistanceTable):
+  """
+  A DistanceTable whose rows are filled in a few BFS sources at a time.
+  Rows 0 .. nextSource-1 are finished; since maze distances are symmetric
+  a pair is known as soon as either of its cells has been a source.
+  """
+  def __init__(self, layout):
+    cells = layout.walls.asList(False)
+    numCells = len(cells)
+    DistanceTable.__init__(self, cells, array('H', [UNREACHABLE]) * (numCells * numCells))
+    self.neighbors = self.getNeighbors()
+    self.nextSource = 0
+
+  def isComplete(self):
+    return self.nextSource == self.numCells
+
+  def compute(self, timeLimit = None):
+    """
+    Runs BFS from unfinished sources until timeLimit seconds have passed
+    (at least one source per call).  Returns True when every row is done.
+    """
+    start = time.time()
+    while self.nextSource < self.numCells:
+      computeRow(self.distances, self.neighbors, [self.nextSource], self.nextSource * self.numCells)
+      self.nextSource += 1
+      if timeLimit is not None and time.time() - start >= timeLimit:
+        break
+    return self.isComplete()
+
+  def lookup(self, i, j):
+    "Returns None if neither cell has been used as a BFS source yet"
+    if i < self.nextSource:
+      return DistanceTable.lookup(self, i, j)
+    if j < self.nextSource:
+      return DistanceTable.lookup(self, j, i)
+    return None
+
+class LazyDistanceTable(DistanceTable):
+  """
+  Computes one BFS row per source cell the first time that source is
+  queried, keeping at most maxRows rows.  When full, the least recently
+  used row is evicted.  hits and misses count row cache lookups.
+  """
+  def __init__(self, layout, maxRows = 256):
+    cells = layout.walls.asList(False)
+    DistanceTable.__init__(self, cells, None)
+    self.neighbors = self.getNeighbors()
+    self.maxRows = maxRows
+    self.rows = {}
+    self.lastUsed = {}
+    self.clock = 0
+    self.hits = 0
+    self.misses = 0
+
+  def getRow(self, i):
+    self.clock += 1
+    if i in self.rows:
+      self.hits += 1
+      self.lastUsed[i] = self.clock
+      return self.rows[i]
+    self.misses += 1
+    if len(self.rows) >= self.maxRows:
+      oldest = min(self.lastUsed, key=self.lastUsed.get)
+      del self.rows[oldest]
+      del self.lastUsed[oldest]
+    row = array('H', [UNREACHABLE]) * self.numCells
+    computeRow(row, self.neighbors, [i], 0)
+    self.rows[i] = row
+    self.lastUsed[i] = self.clock
+    return row
+
+  def lookup(self, i, j):
+    if i not in self.rows and j in self.rows:
+      i, j = j, i
+    distance = self.getRow(i)[j]
+    if distance == UNREACHABLE:
+      return sys.maxint
+    return distance
+
+MAX_FIELDS = 64 # Distance fields kept per table before the cache is reset
+
+class DistanceField:
+  """
+  The maze distance from every cell to the nearest of a fixed set of
+  target cells, computed with a single multi-source BFS.
+  """
+  def __init__(self, table, targets):
+    self.table = table
+    self.targets = targets
+    sources = []
+    for target in targets:
+      if target not in table.index:
+        raise Exception("Position not in grid: " + str(target))
+      sources.append(table.index[target])
+    self.distances = array('H', [UNREACHABLE]) * table.numCells
+    computeRow(self.distances, table.getNeighbors(), sources, 0)
+
+  def getDistance(self, pos):
+    "Distance from pos (which may be fractional) to the nearest target"
+    distances = self.distances
+    best = min([distances[i] + snapDistance for i, snapDistance in self.table.getSnaps(pos)])
+    if best >= UNREACHABLE:
+      return sys.maxint
+    return best
+
+def computeRow(distances, neighbors, sources, row):
+  """
+  Fills in the distances from the nearest of the source cells with a
+  level-by-level BFS, writing the entry for cell j at distances[row + j]
+  """
+  for source in sources:
+    distances[row + source] = 0
+  frontier = list(sources)
+  depth = 0
+  while frontier:
+    depth += 1
+    nextFrontier = []
+    for node in frontier:
+      for other in neighbors[node]:
+        if distances[row + other] == UNREACHABLE:
+          distances[row + other] = depth
+          nextFrontier.append(other)
+    frontier = nextFrontier
 
 
 def getDistanceOnGrid(distances, pos1, pos2):
@@ -155,3 +462,152 @@ def getDistanceOnGrid(distances, pos1, pos2):
       return distances[key]
     return 100000
 
+###############################################
+# PERSISTENT DISTANCE CACHE (SHARED ON DISK)  #
+###############################################
+
+# Directory holding one table file per wall layout.  Set the environment
+# variable PACMAN_DISTANCE_CACHE to move it, or to an empty string to
+# turn the on-disk cache off.  Deleting the directory clears the cache;
+# it is rebuilt as games are played.
+CACHE_DIR = os.environ.get('PACMAN_DISTANCE_CACHE',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'distanceCache'))
+
+# Most megabytes of tables the directory may hold (PACMAN_DISTANCE_CACHE_MB).
+# Each write evicts the least recently used tables above the cap, so runs
+# over many random layouts do not grow the cache without bound.
+CACHE_MAX_BYTES = int(float(os.environ.get('PACMAN_DISTANCE_CACHE_MB', 64)) * 1024 * 1024)
+
+# File format: a little-endian header (magic, width, height, numCells)
+# followed by the numCells x numCells matrix of little-endian uint16s.
+CACHE_MAGIC = 'PACDIST1'
+CACHE_HEADER = struct.Struct('<8sIII')
+
+def mapDistances(buffer, offset, size):
+  """
+  Returns the size uint16 distances stored at offset in a memory-mapped
+  cache file as a ctypes array over the mapped pages.  Indexing it costs
+  about as much as indexing an array('H'), and the pages stay shared
+  between processes that map the same file (the mapping is copy-on-write
+  and never written).  On big-endian machines the file's little-endian
+  entries are copied into a byteswapped array instead.
+  """
+  if sys.byteorder == 'big':
+    distances = array('H')
+    distances.fromstring(buffer[offset:offset + 2 * size])
+    distances.byteswap()
+    return distances
+  return (ctypes.c_uint16 * size).from_buffer(buffer, offset)
+
+def getCachePath(layout):
+  return os.path.join(CACHE_DIR, layout.getWallFingerprint() + '.dist')
+
+def loadOrComputeDistances(layout):
+  """
+  Returns the DistanceTable for a layout, memory-mapping it from the cache
+  directory when a table for the same walls has been written before.
+  """
+  table = loadCachedDistances(layout)
+  if table is None:
+    table = computeDistances(layout)
+    saveCachedDistances(layout, table)
+  return table
+
+def loadCachedDistances(layout):
+  "Returns the cached DistanceTable for a layout, or None"
+  if not CACHE_DIR:
+    return None
+  cells = layout.walls.asList(False)
+  path = getCachePath(layout)
+  distances = loadDistances(path, layout.walls, len(cells))
+  if distances is None:
+    return None
+  # Mark the table as recently used, so pruneCache keeps it
+  try:
+    os.utime(path, None)
+  except OSError:
+    pass
+  return DistanceTable(cells, distances)
+
+def saveCachedDistances(layout, table):
+  if CACHE_DIR:
+    path = getCachePath(layout)
+    saveDistances(path, layout.walls, table)
+    pruneCache(CACHE_MAX_BYTES, keep = path)
+
+def pruneCache(maxBytes, keep = None):
+  """
+  Deletes the least recently used tables (oldest modification time first)
+  until the cache directory holds at most maxBytes of them.  The table at
+  keep is never deleted.  Processes that already mapped a deleted table
+  keep reading it; the next load just recomputes it.
+  """
+  try:
+    names = [name for name in os.listdir(CACHE_DIR) if name.endswith('.dist')]
+  except OSError:
+    return
+  files = []
+  for name in names:
+    path = os.path.join(CACHE_DIR, name)
+    try:
+      stat = os.stat(path)
+    except OSError:
+      continue # Removed by another process
+    files.append((stat.st_mtime, path, stat.st_size))
+  total = sum([size for mtime, path, size in files])
+  for mtime, path, size in sorted(files):
+    if total <= maxBytes: break
+    if path == keep: continue
+    try:
+      os.remove(path)
+    except OSError:
+      pass
+    total -= size
+
+def loadDistances(path, walls, numCells):
+  "Maps a cache file, returning None if it is missing or does not match"
+  try:
+    f = open(path, 'rb')
+  except IOError:
+    return None
+  try:
+    size = os.fstat(f.fileno()).st_size
+    expected = CACHE_HEADER.size + 2 * numCells * numCells
+    if size != expected:
+      return None
+    # ACCESS_COPY gives a writable buffer, as ctypes needs, without ever
+    # writing back to the file
+    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+  except (IOError, OSError, mmap.error):
+    return None
+  finally:
+    f.close()
+  header = CACHE_HEADER.unpack_from(buffer, 0)
+  if header != (CACHE_MAGIC, walls.width, walls.height, numCells):
+    buffer.close()
+    return None
+  return mapDistances(buffer, CACHE_HEADER.size, numCells * numCells)
+
+def saveDistances(path, walls, table):
+  """
+  Writes a table to the cache.  The file is written under a temporary name
+  and renamed into place so concurrent readers never see a partial table.
+  Failures (e.g. a read-only directory) just leave the cache unpopulated.
+  """
+  distances = array('H', table.distances)
+  if sys.byteorder == 'big':
+    distances.byteswap()
+  tmpPath = '%s.%d.tmp' % (path, os.getpid())
+  try:
+    if not os.path.isdir(CACHE_DIR):
+      os.makedirs(CACHE_DIR)
+    f = open(tmpPath, 'wb')
+    try:
+      f.write(CACHE_HEADER.pack(CACHE_MAGIC, walls.width, walls.height, table.numCells))
+      distances.tofile(f)
+    finally:
+      f.close()
+    os.rename(tmpPath, path)
+  except (IOError, OSError):
+    if os.path.exists(tmpPath):
+      os.remove(tmpPath)
@@ -21,7 +21,7 @@
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
 
 from util import *
-import time, os
+import time, os, random
 import traceback
 import sys
 
@@ -67,19 +67,29 @@ class Directions:
                WEST: EAST,
                STOP: STOP}
 
-class Configuration:
+class Configuration(object):
     """
     A Configuration holds the (x,y) coordinate of a character, along with its
     traveling direction.
 
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
+
+    Configurations are made for every move of every searched state, so they
+    keep their fields in slots rather than a per-instance dict.
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos, direction):
         self.pos = pos
         self.direction = direction
 
+    def __getstate__(self):
+        return (self.pos, self.direction)
+
+    def __setstate__(self, state):
+        self.pos, self.direction = state
+
     def getPosition(self):
         return (self.pos)
 
@@ -117,10 +127,12 @@ class Configuration:
             direction = self.direction # There is no stop direction
         return Configuration((x + dx, y+dy), direction)
 
-class AgentState:
+class AgentState(object):
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
+    Like Configurations they use slots, since states are copied per move.
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer', 'numCarrying', 'numReturned')
 
     def __init__( self, startConfiguration, isPacman ):
         self.start = startConfiguration
@@ -144,16 +156,32 @@ class AgentState:
     def __hash__(self):
         return hash(hash(self.configuration) + 13 * hash(self.scaredTimer))
 
+    def __getstate__( self ):
+        return (self.start, self.configuration, self.isPacman, self.scaredTimer, self.numCarrying, self.numReturned)
+
+    def __setstate__( self, state ):
+        (self.start, self.configuration, self.isPacman, self.scaredTimer, self.numCarrying, self.numReturned) = state
+
     def copy( self ):
-        state = AgentState( self.start, self.isPacman )
+        state = object.__new__( AgentState )
+        state.start = self.start
         state.configuration = self.configuration
+        state.isPacman = self.isPacman
         state.scaredTimer = self.scaredTimer
         state.numCarrying = self.numCarrying
         state.numReturned = self.numReturned
         return state
 
+    def deepCopy( self ):
+        "A copy with its own Configurations, for states handed to agents"
+        state = self.copy()
+        state.start = Configuration( self.start.pos, self.start.direction )
+        if self.configuration is not None:
+            state.configuration = Configuration( self.configuration.pos, self.configuration.direction )
+        return state
+
     def getPosition(self):
-        if self.configuration == None: return None
+        if self.configuration is None: return None
         return self.configuration.getPosition()
 
     def getDirection(self):
@@ -190,6 +218,8 @@ class Grid:
 
     def __eq__(self, other):
         if other == None: return False
+        if isinstance(other, BitGrid):
+            return other == self
         return self.data == other.data
 
     def __hash__(self):
@@ -226,6 +256,13 @@ class Grid:
                 if self[x][y] == key: list.append( (x,y) )
         return list
 
+    def freeze(self):
+        """
+        Makes the grid read-only, for grids owned by a shared Layout.  Reads
+        cost the same as before; copies of the grid are writable again.
+        """
+        self.data = FrozenList([FrozenList(x) for x in self.data])
+
     def packBits(self):
         """
         Returns an efficient int list representation
@@ -274,6 +311,150 @@ class Grid:
                 bools.append(False)
         return bools
 
+class BitGrid(Grid):
+    """
+    A Grid of booleans backed by a single arbitrary-precision int instead of
+    a list of lists.  Cell (x,y) is bit x * height + y, the same column-major
+    order Grid uses for __hash__ and packBits, so equal grids hash alike
+    whichever class holds them.
+
+    Data is still accessed via grid[x][y].  count, asList, copy, __eq__ and
+    __hash__ work on the whole int at once instead of looping over cells,
+    which suits grids that are copied and counted far more often than they
+    are read cell by cell (food, as opposed to walls).
+    """
+    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+        if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.bits = 0
+        if initialValue:
+            self.bits = (1 << (width * height)) - 1
+        self._columns = None
+        self._frozen = False
+        if bitRepresentation:
+            self._unpackBits(bitRepresentation)
+
+    def __getitem__(self, i):
+        # Column views are made one at a time as they are used, so a fresh
+        # copy that only has one cell changed (a dot eaten) costs O(1)
+        # rather than a view per column
+        columns = self._columns
+        if columns is None:
+            columns = self._columns = [None] * self.width
+        column = columns[i]
+        if column is None:
+            if i < 0: i += self.width
+            column = columns[i] = _BitGridColumn(self, i)
+        return column
+
+    def __setitem__(self, key, item):
+        column = self[key]
+        for y in range(self.height):
+            column[y] = item[y]
+
+    def freeze(self):
+        self._frozen = True
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_columns'] = None
+        return state
+
+    def __str__(self):
+        out = [[str(self[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        if other == None: return False
+        if isinstance(other, BitGrid):
+            return self.bits == other.bits and self.width == other.width and self.height == other.height
+        return self.width == other.width and self.height == other.height and \
+               self.asList() == other.asList()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def copy(self):
+        g = BitGrid(self.width, self.height)
+        g.bits = self.bits
+        return g
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        # The backing int is immutable, so a copy already shares it
+        return self.copy()
+
+    def count(self, item =True ):
+        ones = bin(self.bits).count('1')
+        if item:
+            return ones
+        return self.width * self.height - ones
+
+    def asList(self, key = True):
+        bits = self.bits
+        if not key:
+            bits = ~bits & ((1 << (self.width * self.height)) - 1)
+        # Reversed binary string: character i is bit i
+        digits = bin(bits)[:1:-1]
+        height = self.height
+        list = []
+        i = digits.find('1')
+        while i >= 0:
+            list.append(divmod(i, height))
+            i = digits.find('1', i + 1)
+        return list
+
+    def getMask(self, minX, maxX):
+        "Returns the int with every bit set for columns minX <= x < maxX"
+        height = self.height
+        return ((1 << ((maxX - minX) * height)) - 1) << (minX * height)
+
+class _BitGridColumn:
+    "A view of one column of a BitGrid, so that grid[x][y] reads and writes bits"
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.offset = x * grid.height
+
+    def _bit(self, y):
+        height = self.grid.height
+        if y < 0: y += height
+        if not 0 <= y < height: raise IndexError('grid index out of range')
+        return self.offset + y
+
+    def __getitem__(self, y):
+        return (self.grid.bits >> self._bit(y)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        if self.grid._frozen: raise TypeError('this grid is read-only')
+        bit = 1 << self._bit(y)
+        if value:
+            self.grid.bits |= bit
+        else:
+            self.grid.bits &= ~bit
+
+    def __len__(self):
+        return self.grid.height
+
+class FrozenList(list):
+    "A list that raises TypeError on any attempt to change it"
+    def _readOnly(self, *args):
+        raise TypeError('this list is read-only')
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = _readOnly
+    __iadd__ = __imul__ = _readOnly
+    append = extend = insert = pop = remove = reverse = sort = _readOnly
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
         return bitRep
@@ -368,21 +549,99 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
+class ActionTable:
+    """
+    The possible actions from every open cell of a maze, precomputed so that
+    finding them is a dictionary lookup instead of probing the walls.
+
+    actions[cell] is the tuple Actions.getPossibleActions gives for an agent
+    standing on cell, in the same order, and successors[cell] pairs each of
+    those actions with the cell it leads to.
+    """
+    def __init__(self, walls):
+        self.walls = walls
+        self.actions = {}
+        self.successors = {}
+        for cell in walls.asList(False):
+            try:
+                possible = tuple(Actions.getPossibleActions(Configuration(cell, Directions.STOP), walls))
+            except IndexError:
+                continue # Open cell on the edge of the grid; left to getPossibleActions
+            x, y = cell
+            self.actions[cell] = possible
+            self.successors[cell] = tuple([(action, (x + Actions._directions[action][0], y + Actions._directions[action][1]))
+                                           for action in possible])
+
+    def getPossibleActions(self, config):
+        "Returns Actions.getPossibleActions( config, walls ) as a new list"
+        possible = self.actions.get(config.pos)
+        if possible is None:
+            # Between grid points, agents must continue straight
+            return Actions.getPossibleActions(config, self.walls)
+        return list(possible)
+
+class ZobristKeys:
+    """
+    Random 64-bit keys for the features of game states: an agent's record
+    (position, direction, scared timer and carried food), a food dot, a
+    capsule, and the score.  A state's Zobrist key is the XOR of the keys
+    of its features, so a move updates it by XORing out the features it
+    removed and XORing in the ones it added.
+
+    Keys are drawn the first time a feature is seen, so they are the same
+    for all states of a process but not between processes.
+    """
+    def __init__( self, seed = 0 ):
+        self.random = random.Random( seed )
+        self.keys = {}
+
+    def getKey( self, feature ):
+        key = self.keys.get( feature )
+        if key is None:
+            key = self.keys[feature] = self.random.getrandbits( 64 )
+        return key
+
+    def getAgentKey( self, index, agentState ):
+        configuration = agentState.configuration
+        if configuration is None:
+            position, direction = None, None
+        else:
+            position, direction = configuration.pos, configuration.direction
+        return self.getKey( (index, position, direction, agentState.scaredTimer, agentState.numCarrying) )
+
+ZOBRIST_KEYS = ZobristKeys()
+
 class GameStateData:
     """
 
     """
-    def __init__( self, prevState = None ):
+    def __init__( self, prevState = None, copyOnWrite = False ):
         """
         Generates a new data packet by copying information from its predecessor.
+
+        With copyOnWrite, the food grid, capsule list and agent states are
+        shared with the predecessor instead of copied.  Rules that change them
+        must then replace the food grid and capsule list rather than edit
+        them, and get agent states to edit through getMutableAgentState.
         """
+        self._ownedAgentStates = None
+        self._zobristKey = None
         if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates( prevState.agentStates )
+            if copyOnWrite:
+                self.food = prevState.food
+                self.capsules = prevState.capsules
+                self.agentStates = prevState.agentStates[:]
+                self._ownedAgentStates = [False for agentState in self.agentStates]
+            else:
+                self.food = prevState.food.shallowCopy()
+                self.capsules = prevState.capsules[:]
+                self.agentStates = self.copyAgentStates( prevState.agentStates )
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self.teamViews = prevState.teamViews
+            self.redReturned = prevState.redReturned
+            self.blueReturned = prevState.blueReturned
 
         self._foodEaten = None
         self._foodAdded = None
@@ -395,13 +654,28 @@ class GameStateData:
     def deepCopy( self ):
         state = GameStateData( self )
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        state.agentStates = [agentState.deepCopy() for agentState in self.agentStates]
+        state.layout = self.layout # Layouts are immutable, so copies share them
+        # The copy's food and capsules may be edited, so it cannot share views
+        # derived from them (see capture.TeamViews)
+        state.teamViews = None
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def getMutableAgentState( self, index ):
+        """
+        Returns the state of agent index for editing, first copying it if it
+        is still shared with the predecessor (see copyOnWrite above).
+        """
+        owned = self._ownedAgentStates
+        if owned is not None and not owned[index]:
+            self.agentStates[index] = self.agentStates[index].copy()
+            owned[index] = True
+        return self.agentStates[index]
+
     def copyAgentStates( self, agentStates ):
         copiedStates = []
         for agentState in agentStates:
@@ -418,19 +692,56 @@ class GameStateData:
         if not self.food == other.food: return False
         if not self.capsules == other.capsules: return False
         if not self.score == other.score: return False
+        if not [s.numCarrying for s in self.agentStates] == [s.numCarrying for s in other.agentStates]: return False
         return True
 
     def __hash__( self ):
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError, e:
-                print e
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        return hash( self.getZobristKey() )
+
+    def getZobristKey( self ):
+        """
+        Returns the 64-bit Zobrist key of the state (see ZobristKeys).  It is
+        computed in full on first use and then carried to successors by
+        updateZobristKey, so it must not be asked for before a state is
+        done being edited.
+        """
+        if self._zobristKey is None:
+            keys = ZOBRIST_KEYS
+            key = keys.getKey( ('score', self.score) )
+            for i, agentState in enumerate( self.agentStates ):
+                key ^= keys.getAgentKey( i, agentState )
+            for position in self.food.asList():
+                key ^= keys.getKey( ('food', position) )
+            for position in self.capsules:
+                key ^= keys.getKey( ('capsule', position) )
+            self._zobristKey = key
+        return self._zobristKey
+
+    def updateZobristKey( self, key, agentStates, score ):
+        """
+        Sets the Zobrist key of a state generated with copyOnWrite from one
+        with the given key, agent states and score, by XORing the keys of
+        the features that the move changed.  Leaves it to be computed on
+        demand if the predecessor had none.
+        """
+        if key is None: return
+        keys = ZOBRIST_KEYS
+        if self._foodEaten is not None:
+            key ^= keys.getKey( ('food', self._foodEaten) )
+        if self._foodAdded:
+            for position in self._foodAdded:
+                key ^= keys.getKey( ('food', position) )
+        if self._capsuleEaten is not None:
+            key ^= keys.getKey( ('capsule', self._capsuleEaten) )
+        for i, owned in enumerate( self._ownedAgentStates ):
+            if owned:
+                key ^= keys.getAgentKey( i, agentStates[i] ) ^ keys.getAgentKey( i, self.agentStates[i] )
+        if score != self.score:
+            key ^= keys.getKey( ('score', score) ) ^ keys.getKey( ('score', self.score) )
+        self._zobristKey = key
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
@@ -490,10 +801,13 @@ class GameStateData:
         """
         self.food = layout.food.copy()
         #self.capsules = []
-        self.capsules = layout.capsules[:]
+        self.capsules = list(layout.capsules)
         self.layout = layout
         self.score = 0
         self.scoreChange = 0
+        self.teamViews = None # Per-team food/capsule views, set by games that have teams
+        self.redReturned = 0 # Food returned home by each team, kept by games that have teams
+        self.blueReturned = 0
 
         self.agentStates = []
         numGhosts = 0
@@ -504,6 +818,41 @@ class GameStateData:
             self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
         self._eaten = [False for a in self.agentStates]
 
+class TurnDeadline:
+    """
+    The time budget of an agent's current turn, handed to agents that
+    define setDeadline.  Deadlines are absolute time.time() values.
+
+    deadline: when the move starts costing a time warning (or would
+    exhaust the agent's total game time)
+    hardDeadline: when the move is forfeited outright
+    totalTimeLeft: game time the agent had left when the turn began
+    warningsUsed, maxWarnings: warnings taken so far, and how many the
+    agent may take before the next one loses the game
+    """
+    def __init__(self, turn, warningTime, totalTimeLeft, warningsUsed, maxWarnings):
+        self.start = turn.start
+        self.hardDeadline = turn.deadline
+        self.deadline = min(turn.start + warningTime, turn.start + totalTimeLeft, turn.deadline)
+        self.totalTimeLeft = totalTimeLeft
+        self.warningsUsed = warningsUsed
+        self.maxWarnings = maxWarnings
+
+    def timeLeft(self):
+        "Seconds left before the move costs a warning"
+        return self.deadline - time.time()
+
+    def hardTimeLeft(self):
+        "Seconds left before the move is forfeited"
+        return self.hardDeadline - time.time()
+
+    def expired(self):
+        return time.time() >= self.deadline
+
+    def canAffordWarning(self):
+        "True if overrunning the deadline this turn would not lose the game"
+        return self.warningsUsed < self.maxWarnings
+
 try:
     import boinc
     _BOINC_ENABLED = True
@@ -544,6 +893,27 @@ class Game:
         self.agentCrashed = True
         self.rules.agentCrash(self, agentIndex)
 
+    def _copyStateForAgent( self ):
+        """
+        A copy of the current state to hand to an agent, which cannot change
+        the game through it.  States that provide a cheaper makeAgentView
+        (capture) use it instead of deepCopy.
+        """
+        if hasattr( self.state, 'makeAgentView' ):
+            return self.state.makeAgentView()
+        return self.state.deepCopy()
+
+    def _stateForObservation( self, agent ):
+        """
+        The state to pass to agent.observationFunction.  An agent whose
+        observationIsPrivate() is true builds its observation as a fresh
+        copy without changing its argument, so it gets the game's state
+        itself instead of a copy it would copy again.
+        """
+        if 'observationIsPrivate' in dir( agent ) and agent.observationIsPrivate():
+            return self.state
+        return self._copyStateForAgent()
+
     OLD_STDOUT = None
     OLD_STDERR = None
 
@@ -587,7 +957,7 @@ class Game:
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
+                        timed_func = TimeoutFunction(agent.registerInitialState, self.rules.getMaxStartupTime(i))
                         try:
                             start_time = time.time()
                             timed_func(self.state.deepCopy())
@@ -616,75 +986,82 @@ class Game:
             agent = self.agents[agentIndex]
             move_time = 0
             skip_action = False
-            # Generate an observation of the state
-            if 'observationFunction' in dir( agent ):
+            # One timer covers the observation and the action of the turn
+            turn = TurnTimer(self.rules.getMoveTimeout(agentIndex))
+            if 'setDeadline' in dir( agent ):
+                agent.setDeadline(TurnDeadline(turn, self.rules.getMoveWarningTime(agentIndex),
+                                               self.rules.getMaxTotalTime(agentIndex) - self.totalAgentTimes[agentIndex],
+                                               self.totalAgentTimeWarnings[agentIndex],
+                                               self.rules.getMaxTimeWarnings(agentIndex)))
+            if self.catchExceptions:
+                turn.arm()
+            try:
+                # Generate an observation of the state
+                if 'observationFunction' in dir( agent ):
+                    self.mute(agentIndex)
+                    if self.catchExceptions:
+                        try:
+                            try:
+                                observation = turn.call(agent.observationFunction, self._stateForObservation(agent))
+                            except TimeoutFunctionException:
+                                skip_action = True
+                            self.unmute()
+                        except Exception,data:
+                            self._agentCrash(agentIndex, quiet=False)
+                            self.unmute()
+                            return
+                    else:
+                        observation = agent.observationFunction(self._stateForObservation(agent))
+                    self.unmute()
+                else:
+                    observation = self._copyStateForAgent()
+
+                # Solicit an action
+                action = None
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
                         try:
-                            start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            if skip_action:
+                                raise TimeoutFunctionException()
+                            action = turn.call(agent.getAction, observation)
                         except TimeoutFunctionException:
-                            skip_action = True
-                        move_time += time.time() - start_time
-                        self.unmute()
-                    except Exception,data:
-                        self._agentCrash(agentIndex, quiet=False)
-                        self.unmute()
-                        return
-                else:
-                    observation = agent.observationFunction(self.state.deepCopy())
-                self.unmute()
-            else:
-                observation = self.state.deepCopy()
-
-            # Solicit an action
-            action = None
-            self.mute(agentIndex)
-            if self.catchExceptions:
-                try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
-                    try:
-                        start_time = time.time()
-                        if skip_action:
-                            raise TimeoutFunctionException()
-                        action = timed_func( observation )
-                    except TimeoutFunctionException:
-                        print >>sys.stderr, "Agent %d timed out on a single move!" % agentIndex
-                        self.agentTimeout = True
-                        self._agentCrash(agentIndex, quiet=True)
-                        self.unmute()
-                        return
-
-                    move_time += time.time() - start_time
-
-                    if move_time > self.rules.getMoveWarningTime(agentIndex):
-                        self.totalAgentTimeWarnings[agentIndex] += 1
-                        print >>sys.stderr, "Agent %d took too long to make a move! This is warning %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
-                        if self.totalAgentTimeWarnings[agentIndex] > self.rules.getMaxTimeWarnings(agentIndex):
-                            print >>sys.stderr, "Agent %d exceeded the maximum number of warnings: %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
+                            print >>sys.stderr, "Agent %d timed out on a single move!" % agentIndex
                             self.agentTimeout = True
                             self._agentCrash(agentIndex, quiet=True)
                             self.unmute()
                             return
 
-                    self.totalAgentTimes[agentIndex] += move_time
-                    #print "Agent: %d, time: %f, total: %f" % (agentIndex, move_time, self.totalAgentTimes[agentIndex])
-                    if self.totalAgentTimes[agentIndex] > self.rules.getMaxTotalTime(agentIndex):
-                        print >>sys.stderr, "Agent %d ran out of time! (time: %1.2f)" % (agentIndex, self.totalAgentTimes[agentIndex])
-                        self.agentTimeout = True
-                        self._agentCrash(agentIndex, quiet=True)
+                        move_time = turn.elapsed()
+
+                        if move_time > self.rules.getMoveWarningTime(agentIndex):
+                            self.totalAgentTimeWarnings[agentIndex] += 1
+                            print >>sys.stderr, "Agent %d took too long to make a move! This is warning %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
+                            if self.totalAgentTimeWarnings[agentIndex] > self.rules.getMaxTimeWarnings(agentIndex):
+                                print >>sys.stderr, "Agent %d exceeded the maximum number of warnings: %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
+                                self.agentTimeout = True
+                                self._agentCrash(agentIndex, quiet=True)
+                                self.unmute()
+                                return
+
+                        self.totalAgentTimes[agentIndex] += move_time
+                        #print "Agent: %d, time: %f, total: %f" % (agentIndex, move_time, self.totalAgentTimes[agentIndex])
+                        if self.totalAgentTimes[agentIndex] > self.rules.getMaxTotalTime(agentIndex):
+                            print >>sys.stderr, "Agent %d ran out of time! (time: %1.2f)" % (agentIndex, self.totalAgentTimes[agentIndex])
+                            self.agentTimeout = True
+                            self._agentCrash(agentIndex, quiet=True)
+                            self.unmute()
+                            return
+                        self.unmute()
+                    except Exception,data:
+                        self._agentCrash(agentIndex)
                         self.unmute()
                         return
-                    self.unmute()
-                except Exception,data:
-                    self._agentCrash(agentIndex)
-                    self.unmute()
-                    return
-            else:
-                action = agent.getAction(observation)
-            self.unmute()
+                else:
+                    action = agent.getAction(observation)
+                self.unmute()
+            finally:
+                turn.disarm()
 
             # Execute the action
             self.moveHistory.append( (agentIndex, action) )
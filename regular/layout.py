@@ -13,29 +13,50 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Grid, BitGrid, ActionTable
 import os
 import random
+import hashlib
 
 VISIBILITY_MATRIX_CACHE = {}
+TOPOLOGY_CACHE = {}
+ACTION_TABLE_CACHE = {}
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are immutable once built (the walls and food grids are frozen,
+    the other fields are tuples and assigning a field raises
+    AttributeError), so game states and their copies all share the same
+    Layout object instead of re-parsing it.
     """
 
     def __init__(self, layoutText):
         self.width = len(layoutText[0])
         self.height= len(layoutText)
         self.walls = Grid(self.width, self.height, False)
-        self.food = Grid(self.width, self.height, False)
+        self.food = BitGrid(self.width, self.height, False)
         self.capsules = []
         self.agentPositions = []
         self.numGhosts = 0
         self.processLayoutText(layoutText)
-        self.layoutText = layoutText
+        self.layoutText = tuple(layoutText)
         self.totalFood = len(self.food.asList())
+        self._wallFingerprint = None
+        self._actionTable = None
+
+        self.walls.freeze()
+        self.food.freeze()
+        self.capsules = tuple(self.capsules)
+        self.agentPositions = tuple(self.agentPositions)
         # self.initializeVisibilityMatrix()
+        self.__dict__['_frozen'] = True
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get('_frozen'):
+            raise AttributeError('Layouts are immutable; cannot set ' + name)
+        self.__dict__[name] = value
 
     def getNumGhosts(self):
         return self.numGhosts
@@ -56,10 +77,47 @@ class Layout:
                             while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)] :
                                 vis[x][y][direction].add((nextx, nexty))
                                 nextx, nexty = x + dx, y + dy
-            self.visibility = vis
+            self.__dict__['visibility'] = vis
             VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
         else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
+            self.__dict__['visibility'] = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
+
+    def getWallFingerprint(self):
+        """
+        Returns a hex digest identifying the wall configuration.  It is
+        computed once per layout, so it is a cheap key for caches of
+        per-maze data such as distance tables.
+        """
+        if self._wallFingerprint is None:
+            walls = self.walls
+            text = '%d %d\n%s' % (walls.width, walls.height, str(walls))
+            self.__dict__['_wallFingerprint'] = hashlib.sha1(text).hexdigest()
+        return self._wallFingerprint
+
+    def getTopology(self):
+        """
+        Returns the topology.Topology index (degrees, dead ends, chokepoints,
+        corridors, home borders) for this layout's walls.  It is built the
+        first time it is asked for and shared by every layout with the same
+        walls.
+        """
+        key = self.getWallFingerprint()
+        if key not in TOPOLOGY_CACHE:
+            import topology
+            TOPOLOGY_CACHE[key] = topology.Topology(self.walls)
+        return TOPOLOGY_CACHE[key]
+
+    def getActionTable(self):
+        """
+        Returns the game.ActionTable of possible actions from each open cell,
+        shared by every layout with the same walls.
+        """
+        if self._actionTable is None:
+            key = self.getWallFingerprint()
+            if key not in ACTION_TABLE_CACHE:
+                ACTION_TABLE_CACHE[key] = ActionTable(self.walls)
+            self.__dict__['_actionTable'] = ACTION_TABLE_CACHE[key]
+        return self._actionTable
 
     def isWall(self, pos):
         x, col = pos
@@ -90,7 +148,8 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        # Layouts are immutable, so a copy can be the layout itself
+        return self
 
     def processLayoutText(self, layoutText):
         """
@@ -0,0 +1,250 @@
+# league.py
+# ---------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+League.py runs a round-robin league between any number of capture teams.
+Every pair of teams meets on every layout twice, once from each side.
+Layouts come from a seed file such as the one generateTournamentLayouts.py
+writes, plus any named layouts.  Games are played on a pool of worker
+processes, and each finished game is appended to a checkpoint file, so an
+interrupted league picks up where it stopped.  At the end a standings table
+with Elo ratings is printed.
+
+To run a league between three teams on the tournament seeds:
+  python league.py -t baselineTeam,myTeam2,myteam1 -s ../driver/SEEDS --workers 4
+"""
+
+import sys, os, random, hashlib
+import capture, layout, util
+
+# Elo parameters: every team starts at ELO_START and moves by at most
+# ELO_K points per game
+ELO_START = 1500.0
+ELO_K = 32.0
+
+def readSeeds( filename ):
+  "Reads the maze seeds of a seed file, one integer per line"
+  with open(filename) as f:
+    return [int(line) for line in f if line.strip()]
+
+def loadLayouts( seedFile, layoutNames ):
+  "Returns a list of (name, layoutText) for the seeded and named layouts"
+  layouts = []
+  if seedFile:
+    for seed in readSeeds(seedFile):
+      text = capture.randomLayout(seed).split('\n')
+      layouts.append(('RANDOM%d' % seed, layout.Layout(text).layoutText))
+  for name in layoutNames:
+    l = layout.getLayout(name)
+    if l is None: raise Exception("The layout " + name + " cannot be found")
+    layouts.append((name, l.layoutText))
+  return layouts
+
+def schedule( teams, layouts ):
+  """
+  Returns the games of the league as (red, blue, layoutName) in a fixed
+  order: for each pair of teams and each layout, both side assignments.
+  """
+  games = []
+  for i in range(len(teams)):
+    for j in range(i + 1, len(teams)):
+      for name, text in layouts:
+        games.append((teams[i], teams[j], name))
+        games.append((teams[j], teams[i], name))
+  return games
+
+def gameSeed( game ):
+  "The random seed of a game, which depends only on its teams and layout"
+  return int(hashlib.md5('\t'.join(game)).hexdigest()[:8], 16)
+
+def readCheckpoint( filename ):
+  "Returns a dict from (red, blue, layoutName) to score of finished games"
+  results = {}
+  if not os.path.exists(filename): return results
+  with open(filename) as f:
+    for line in f:
+      fields = line.rstrip('\n').split('\t')
+      if len(fields) != 4: continue # A line cut short by an interruption
+      red, blue, name, score = fields
+      results[(red, blue, name)] = int(score)
+  return results
+
+def trimCheckpoint( filename ):
+  "Cuts off a last line left unfinished by an interruption, so appends start on a fresh line"
+  if not os.path.exists(filename): return
+  with open(filename, 'rb+') as f:
+    contents = f.read()
+    if contents and not contents.endswith('\n'):
+      f.truncate(contents.rfind('\n') + 1)
+
+def writeCheckpoint( f, game, score ):
+  "Appends one finished game to the checkpoint file and flushes it to disk"
+  f.write('%s\t%s\t%s\t%d\n' % (game + (score,)))
+  f.flush()
+  os.fsync(f.fileno())
+
+# The agents loaded so far in a worker process, keyed by (team, isRed)
+LEAGUE_AGENTS = {}
+
+def getLeagueAgents( team, isRed ):
+  "Loads a team once per side in a worker process and reuses it afterwards"
+  if (team, isRed) not in LEAGUE_AGENTS:
+    util.mutePrint()
+    try:
+      LEAGUE_AGENTS[(team, isRed)] = capture.loadAgents(isRed, team, True, {})
+    finally:
+      util.unmutePrint()
+  return LEAGUE_AGENTS[(team, isRed)]
+
+def playLeagueGame( task ):
+  "Plays one league game in a worker process; returns the game and its score"
+  game, layoutText, length, catchExceptions = task
+  import textDisplay
+  red, blue, name = game
+  redAgents = getLeagueAgents(red, True)
+  blueAgents = getLeagueAgents(blue, False)
+  agents = sum([list(el) for el in zip(redAgents, blueAgents)],[])
+  random.seed(gameSeed(game))
+  rules = capture.CaptureRules(quiet = True)
+  util.mutePrint()
+  try:
+    g = rules.newGame( layout.Layout(list(layoutText)), agents, textDisplay.NullGraphics(), length, True, catchExceptions )
+  finally:
+    util.unmutePrint()
+  g.run()
+  return game, g.state.data.score
+
+def computeStandings( teams, games, results ):
+  """
+  Tallies the finished games into one row per team: games played, wins,
+  draws, losses, points (3 per win, 1 per draw), score difference and Elo
+  rating.  Elo is updated in schedule order, so the ratings do not depend
+  on the order in which the workers finished.  Rows are sorted by rating.
+  """
+  rows = dict((team, {'team': team, 'played': 0, 'won': 0, 'drawn': 0, 'lost': 0,
+                      'points': 0, 'diff': 0, 'elo': ELO_START}) for team in teams)
+  for game in games:
+    if game not in results: continue
+    red, blue, name = game
+    score = results[game]
+    rows[red]['diff'] += score
+    rows[blue]['diff'] -= score
+    for team, outcome in ((red, cmp(score, 0)), (blue, cmp(0, score))):
+      row = rows[team]
+      row['played'] += 1
+      if outcome > 0:
+        row['won'] += 1
+        row['points'] += 3
+      elif outcome == 0:
+        row['drawn'] += 1
+        row['points'] += 1
+      else:
+        row['lost'] += 1
+
+    # Expected score of red against blue, from the ratings before the game
+    expected = 1.0 / (1.0 + 10 ** ((rows[blue]['elo'] - rows[red]['elo']) / 400.0))
+    actual = (cmp(score, 0) + 1) / 2.0
+    rows[red]['elo'] += ELO_K * (actual - expected)
+    rows[blue]['elo'] -= ELO_K * (actual - expected)
+
+  return sorted(rows.values(), key=lambda row: (-row['elo'], -row['points'], row['team']))
+
+def printStandings( standings ):
+  "Prints the standings table"
+  width = max([len('Team')] + [len(row['team']) for row in standings])
+  print '%-*s %6s %4s %4s %4s %6s %6s %7s' % (width, 'Team', 'Played', 'W', 'D', 'L', 'Points', 'Diff', 'Elo')
+  for row in standings:
+    print '%-*s %6d %4d %4d %4d %6d %+6d %7.1f' % (width, row['team'], row['played'], row['won'],
+                                                  row['drawn'], row['lost'], row['points'],
+                                                  row['diff'], row['elo'])
+
+def runLeague( teams, layouts, workers, length, checkpoint, catchExceptions=False ):
+  """
+  Plays every game of the league that the checkpoint does not already hold,
+  recording each one as it finishes, then prints and returns the standings.
+  """
+  games = schedule(teams, layouts)
+  layoutTexts = dict(layouts)
+  results = readCheckpoint(checkpoint)
+  results = dict((game, results[game]) for game in games if game in results)
+  tasks = [(game, layoutTexts[game[2]], length, catchExceptions) for game in games if game not in results]
+  print 'League of %d teams on %d layouts: %d games, %d already played' % (len(teams), len(layouts), len(games), len(results))
+
+  if tasks:
+    trimCheckpoint(checkpoint)
+    with open(checkpoint, 'a') as f:
+      if workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers)
+        played = pool.imap_unordered(playLeagueGame, tasks)
+      else:
+        pool = None
+        played = (playLeagueGame(task) for task in tasks)
+      try:
+        for game, score in played:
+          results[game] = score
+          writeCheckpoint(f, game, score)
+          print '[%d/%d] %s (red) vs %s (blue) on %s: %d' % ((len(results), len(games)) + game + (score,))
+      except:
+        if pool is not None: pool.terminate()
+        raise
+      if pool is not None:
+        pool.close()
+        pool.join()
+
+  standings = computeStandings(teams, games, results)
+  printStandings(standings)
+  return standings
+
+def readCommand( argv ):
+  """
+  Processes the command used to run a league from the command line.
+  """
+  from optparse import OptionParser
+  usageStr = """
+  USAGE:      python league.py <options>
+  EXAMPLES:   (1) python league.py -t baselineTeam,myTeam2 -l defaultCapture
+                  - plays baselineTeam against myTeam2 on defaultCapture from both sides
+              (2) python league.py -t baselineTeam,myTeam2,myteam1 -s ../driver/SEEDS --workers 4
+                  - plays a league on the layouts generateTournamentLayouts.py seeded, on 4 processes
+  """
+  parser = OptionParser(usageStr)
+
+  parser.add_option('-t', '--teams', help='Comma separated list of team modules')
+  parser.add_option('-s', '--seeds', help='File of maze seeds to play on, one per line', default=None)
+  parser.add_option('-l', '--layouts', help='Comma separated list of named layouts to play on', default='')
+  parser.add_option('-w', '--workers', type='int', dest='workers',
+                    help='Number of processes to play games on [Default: %default]', default=1)
+  parser.add_option('-i', '--time', type='int', dest='time', help='TIME limit of a game in moves', default=1200, metavar='TIME')
+  parser.add_option('--checkpoint', dest='checkpoint',
+                    help='File of finished games to resume from [Default: %default]', default='league.checkpoint')
+  parser.add_option('-c', '--catchExceptions', action='store_true', default=False,
+                    help='Catch exceptions and enforce time limits')
+
+  options, otherjunk = parser.parse_args(argv)
+  if len(otherjunk) != 0: raise Exception('Unrecognized options: ' + str(otherjunk))
+
+  teams = [team for team in (options.teams or '').split(',') if team]
+  if len(teams) < 2: raise Exception('A league needs at least two teams (-t)')
+  if len(set(teams)) != len(teams): raise Exception('A team may only enter the league once')
+  if options.workers < 1: raise Exception('--workers must be at least 1')
+  layouts = loadLayouts(options.seeds, [name for name in options.layouts.split(',') if name])
+  if not layouts: raise Exception('A league needs at least one layout (-s or -l)')
+
+  return {'teams': teams, 'layouts': layouts, 'workers': options.workers, 'length': options.time,
+          'checkpoint': options.checkpoint, 'catchExceptions': options.catchExceptions}
+
+if __name__ == '__main__':
+  options = readCommand( sys.argv[1:] )
+  runLeague(**options)
@@ -57,15 +57,7 @@ class OffensiveReflexAgent(CaptureAgent):
     self.start = gameState.getAgentPosition(self.index)
     CaptureAgent.registerInitialState(self, gameState)
 
-    self.border = []
-    if self.red:
-      self.borderX = gameState.data.layout.width/2 - 1
-    else:
-      self.borderX = gameState.data.layout.width / 2
-
-    for i in range(gameState.data.layout.height):
-      if not gameState.data.layout.walls[self.borderX][i]:
-        self.border.append(((self.borderX), i))
+    self.border = gameState.data.layout.getTopology().getHomeBorder(self.red)
 
   def chooseAction(self, gameState):
     """
@@ -98,23 +90,11 @@ class OffensiveReflexAgent(CaptureAgent):
 
     return bestAction
 
-  def getSuccessor(self, gameState, action):
-    """
-    Finds the next successor which is a grid position (location tuple).
-    """
-    successor = gameState.generateSuccessor(self.index, action)
-    pos = successor.getAgentState(self.index).getPosition()
-    if pos != nearestPoint(pos):
-      # Only half a grid position was covered
-      return successor.generateSuccessor(self.index, action)
-    else:
-      return successor
-
   def evaluate(self, gameState, action):
     """
     Computes a linear combination of features and feature weights
     """
-    features = self.getFeatures(gameState, action)
+    features = self.getCachedFeatures(gameState, action)
     weights = self.getWeights(gameState, action)
     return features * weights
 
@@ -128,7 +108,7 @@ class OffensiveReflexAgent(CaptureAgent):
 
     if len(foodList) > 0:  # This should always be True,  but better safe than sorry
       myPos = successor.getAgentState(self.index).getPosition()
-      minDistance = min([self.getMazeDistance(myPos, food) for food in foodList])
+      minDistance = self.distancer.nearest(myPos, foodList)[0]
       features['distanceToFood'] = minDistance
 
     features['stop'] = 0
@@ -153,14 +133,14 @@ class OffensiveReflexAgent(CaptureAgent):
     #print features['enemyClose']
     capsuleList = self.getCapsules(successor)
     if len(capsuleList) > 0:
-      minCapDistance = min([self.getMazeDistance(myPos, cap) for cap in capsuleList])
+      minCapDistance = self.distancer.nearest(myPos, capsuleList)[0]
       if features['enemyClose'] == 0:
         features['distanceToCapsule'] = minCapDistance
       else:
         features['distanceToCapsule'] = 5 * minCapDistance
 
     #distance to the nearest score spot
-    disttoscore = min([self.getMazeDistance(myPos, scorespot) for scorespot in self.border])
+    disttoscore = self.distancer.getDistanceField(self.border).getDistance(myPos)
     features['distToScore'] = disttoscore
 
     return features
@@ -196,18 +176,6 @@ class DefensiveReflexAgent(CaptureAgent):
 		#self.start = gameState.getAgentPosition(self.index)
 		CaptureAgent.registerInitialState(self, gameState)
 
-	def getSuccessor(self, gameState, action):
-		"""
-		Finds the next successor which is a grid position (location tuple).
-		"""
-		successor = gameState.generateSuccessor(self.index, action)
-		pos = successor.getAgentState(self.index).getPosition()
-		if pos != nearestPoint(pos):
-			# Only half a grid position was covered
-			return successor.generateSuccessor(self.index, action)
-		else:
-			return successor
-
 	def getFeatures(self, gameState, action):
 		features = util.Counter()
 		successor = self.getSuccessor(gameState, action)
@@ -240,7 +208,7 @@ class DefensiveReflexAgent(CaptureAgent):
 		"""
 		Computes a linear combination of features and feature weights
 		"""
-		features = self.getFeatures(gameState, action)
+		features = self.getCachedFeatures(gameState, action)
 		weights = self.getWeights(gameState, action)
 		return features * weights
 
@@ -86,23 +86,11 @@ class ReflexCaptureAgent(CaptureAgent):
 
     return bestAction
 
-  def getSuccessor(self, gameState, action):
-    """
-    Finds the next successor which is a grid position (location tuple).
-    """
-    successor = gameState.generateSuccessor(self.index, action)
-    pos = successor.getAgentState(self.index).getPosition()
-    if pos != nearestPoint(pos):
-      # Only half a grid position was covered
-      return successor.generateSuccessor(self.index, action)
-    else:
-      return successor
-
   def evaluate(self, gameState, action):
     """
     Computes a linear combination of features and feature weights
     """
-    features = self.getFeatures(gameState, action)
+    features = self.getCachedFeatures(gameState, action)
     weights = self.getWeights(gameState, action)
     return features * weights
 
@@ -140,7 +128,7 @@ class OffensiveReflexAgent(ReflexCaptureAgent):
 
     if len(foodList) > 0:  # This should always be True,  but better safe than sorry
       myPos = successor.getAgentState(self.index).getPosition()
-      minDistance = min([self.getMazeDistance(myPos, food) for food in foodList])
+      minDistance = self.distancer.nearest(myPos, foodList)[0]
       features['distanceToFood'] = minDistance
 
     features['enemyClose'] = 0
@@ -214,16 +202,6 @@ class DefensiveReflexAgent(CaptureAgent):
 		self.myFoods = CaptureAgent.getFood(self, gameState).asList()
 		self.opFoods = CaptureAgent.getFoodYouAreDefending(self, gameState).asList()
 
-	# Finds the next successor which is a grid position (location tuple).
-	def getSuccessor(self, gameState, action):
-		successor = gameState.generateSuccessor(self.index, action)
-		pos = successor.getAgentState(self.index).getPosition()
-		if pos != nearestPoint(pos):
-			# Only half a grid position was covered
-			return successor.generateSuccessor(self.index, action)
-		else:
-			return successor
-
 	# Returns a counter of features for the state
 	def getFeatures(self, gameState, action):
 		features = util.Counter()
@@ -256,7 +234,7 @@ class DefensiveReflexAgent(CaptureAgent):
 
 	# Computes a linear combination of features and feature weights
 	def evaluate(self, gameState, action):
-		features = self.getFeatures(gameState, action)
+		features = self.getCachedFeatures(gameState, action)
 		weights = self.getWeights(gameState, action)
 		return features * weights
 
@@ -0,0 +1,204 @@
+# topology.py
+# -----------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+This file contains a Topology object describing the structure of a maze:
+cell degrees, dead ends, articulation points, corridors and the home
+border of each team.  Everything is computed once per wall configuration,
+so queries during search are dictionary lookups.  A Topology is shared by
+every game in the process, so the cells it returns come in tuples.
+
+Example:
+topology = gameState.data.layout.getTopology()
+topology.getDeadEndDepth( (1,1) )
+"""
+
+class Topology:
+  def __init__(self, walls):
+    self.width = walls.width
+    self.height = walls.height
+    self.cells = tuple(walls.asList(False))
+    self.neighbors = {}
+    for x, y in self.cells:
+      adjacent = [(x,y+1), (x,y-1), (x+1,y), (x-1,y)]
+      self.neighbors[(x, y)] = tuple([other for other in adjacent
+                                      if 0 <= other[0] < walls.width and 0 <= other[1] < walls.height
+                                      and not walls[other[0]][other[1]]])
+    self.degree = dict((cell, len(others)) for cell, others in self.neighbors.items())
+
+    self.deadEndDepth = {}
+    self.deadEndExit = {}
+    self._computeDeadEnds()
+    self.articulationPoints = self._computeArticulationPoints()
+    self.corridors = []
+    self.corridorOf = {}
+    self._computeCorridors()
+
+    redX = self.width / 2 - 1
+    blueX = self.width / 2
+    self.redBorder = tuple([(redX, y) for y in range(self.height) if not walls[redX][y]])
+    self.blueBorder = tuple([(blueX, y) for y in range(self.height) if not walls[blueX][y]])
+
+  ############
+  # Queries  #
+  ############
+
+  def getDegree(self, cell):
+    "Number of open neighbors of a cell"
+    return self.degree[cell]
+
+  def getNeighbors(self, cell):
+    return self.neighbors[cell]
+
+  def isDeadEnd(self, cell):
+    """
+    True if the cell lies in a dead-end branch: every way out of it passes
+    back through the branch's exit.
+    """
+    return self.deadEndDepth[cell] > 0
+
+  def getDeadEndDepth(self, cell):
+    """
+    How many steps the cell is from the mouth of its dead-end branch
+    (0 for cells on a cycle of the maze).
+    """
+    return self.deadEndDepth[cell]
+
+  def getDeadEndExit(self, cell):
+    "The cell just outside the dead-end branch containing cell, or None"
+    return self.deadEndExit.get(cell)
+
+  def isArticulationPoint(self, cell):
+    """
+    True if blocking the cell splits the maze in two, i.e. it is a
+    chokepoint every path between the two parts must use.
+    """
+    return cell in self.articulationPoints
+
+  def getCorridor(self, cell):
+    """
+    Returns the corridor (a tuple of consecutive degree-2 cells) containing
+    cell, or None if the cell is a junction or dead end tip.
+    """
+    i = self.corridorOf.get(cell)
+    if i is None:
+      return None
+    return self.corridors[i]
+
+  def getHomeBorder(self, isRed):
+    "Open cells on a team's side of the center line where Pacmen score"
+    if isRed:
+      return self.redBorder
+    else:
+      return self.blueBorder
+
+  #############################
+  # Machinery for the index   #
+  #############################
+
+  def _computeDeadEnds(self):
+    """
+    Peels cells of degree one until only cycles (the 2-core) remain; the
+    peeled cells form the dead-end branches.  Depths are then measured by
+    BFS from the core back into the branches.
+    """
+    remaining = dict(self.degree)
+    leaves = [cell for cell in self.cells if remaining[cell] <= 1]
+    peeled = set()
+    lastRound = leaves
+    while leaves:
+      lastRound = leaves
+      nextLeaves = []
+      for cell in leaves:
+        peeled.add(cell)
+        for other in self.neighbors[cell]:
+          if other in peeled: continue
+          remaining[other] -= 1
+          if remaining[other] == 1:
+            nextLeaves.append(other)
+      leaves = nextLeaves
+
+    core = [cell for cell in self.cells if cell not in peeled]
+    if not core:
+      # The whole maze is a tree; measure depth from where peeling ended
+      core = lastRound
+    for cell in core:
+      self.deadEndDepth[cell] = 0
+    frontier = [(cell, cell) for cell in core]
+    depth = 0
+    while frontier:
+      depth += 1
+      nextFrontier = []
+      for cell, mouth in frontier:
+        for other in self.neighbors[cell]:
+          if other in self.deadEndDepth: continue
+          self.deadEndDepth[other] = depth
+          self.deadEndExit[other] = mouth
+          nextFrontier.append((other, mouth))
+      frontier = nextFrontier
+    for cell in self.cells:
+      self.deadEndDepth.setdefault(cell, 0)
+
+  def _computeArticulationPoints(self):
+    "Iterative Tarjan search for articulation points"
+    discovery = {}
+    low = {}
+    points = set()
+    counter = 0
+    for root in self.cells:
+      if root in discovery: continue
+      discovery[root] = low[root] = counter
+      counter += 1
+      rootChildren = 0
+      stack = [(root, None, iter(self.neighbors[root]))]
+      while stack:
+        cell, parent, others = stack[-1]
+        advanced = False
+        for other in others:
+          if other == parent: continue
+          if other in discovery:
+            low[cell] = min(low[cell], discovery[other])
+          else:
+            discovery[other] = low[other] = counter
+            counter += 1
+            if cell == root: rootChildren += 1
+            stack.append((other, cell, iter(self.neighbors[other])))
+            advanced = True
+            break
+        if advanced: continue
+        stack.pop()
+        if parent is not None:
+          low[parent] = min(low[parent], low[cell])
+          if parent != root and low[cell] >= discovery[parent]:
+            points.add(parent)
+      if rootChildren > 1:
+        points.add(root)
+    return frozenset(points)
+
+  def _computeCorridors(self):
+    "Groups maximal runs of degree-2 cells into corridors"
+    for start in self.cells:
+      if self.degree[start] != 2 or start in self.corridorOf: continue
+      self.corridorOf[start] = len(self.corridors)
+      # Walk out in both directions from the starting cell
+      runs = []
+      for first in self.neighbors[start]:
+        previous, cell = start, first
+        run = []
+        while self.degree[cell] == 2 and cell not in self.corridorOf:
+          self.corridorOf[cell] = len(self.corridors)
+          run.append(cell)
+          previous, cell = cell, [o for o in self.neighbors[cell] if o != previous][0]
+        runs.append(run)
+      self.corridors.append(tuple(list(reversed(runs[0])) + [start] + runs[1]))
@@ -201,6 +201,50 @@ class PriorityQueueWithFunction(PriorityQueue):
         "Adds an item to the queue with priority from the priority function"
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
+class TranspositionTable:
+    """
+      A fixed-size memo for search results, keyed by state keys such as
+      GameState.getZobristKey().  Each key maps to a single slot, so the
+      table never grows past its size.
+
+      When two keys compete for a slot the new entry replaces the old one
+      if the old one is from an earlier search (see newSearch) or was
+      computed to no greater depth; otherwise the old entry is kept, since
+      deeper results cost more to recompute.
+    """
+    def  __init__(self, size = 1 << 16):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def newSearch(self):
+        "Marks the stored entries as left from an earlier search, e.g. the last turn"
+        self.generation += 1
+
+    def store(self, key, value, depth = 0):
+        "Stores the value computed for key by a search to the given depth"
+        slot = hash(key) % self.size
+        entry = self.slots[slot]
+        if entry is None or entry[3] != self.generation or depth >= entry[2]:
+            self.slots[slot] = (key, value, depth, self.generation)
+
+    def lookup(self, key, depth = 0):
+        """
+          Returns the value stored for key by a search to at least the given
+          depth, or None if there is none.
+        """
+        entry = self.slots[hash(key) % self.size]
+        if entry is not None and entry[0] == key and entry[2] >= depth:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def clear(self):
+        self.slots = [None] * self.size
+
 
 def manhattanDistance( xy1, xy2 ):
     "Returns the Manhattan distance between points xy1 and xy2"
@@ -580,11 +624,11 @@ def pause():
 
 # code to handle timeouts
 #
-# FIXME
-# NOTE: TimeoutFuncton is NOT reentrant.  Later timeouts will silently
-# disable earlier timeouts.  Could be solved by maintaining a global list
-# of active time outs.  Currently, questions which have test cases calling
-# this have all student code so wrapped.
+# Timeouts are driven by one real-time interval timer (signal.setitimer)
+# shared by every armed TurnTimer.  The armed timers are kept in a global
+# list, so timeouts nest: the interval timer is always programmed for the
+# earliest pending deadline, and disarming an inner timer re-programs it
+# for the outer one.
 #
 import signal
 import time
@@ -593,33 +637,116 @@ class TimeoutFunctionException(Exception):
     pass
 
 
+_ARMED_TIMERS = []
+_OLD_ALARM_HANDLER = None
+
+def _scheduleAlarm():
+    "Programs the interval timer for the earliest deadline that has not fired"
+    pending = [timer.deadline for timer in _ARMED_TIMERS if not timer.fired]
+    if pending:
+        signal.setitimer(signal.ITIMER_REAL, max(min(pending) - time.time(), 1e-6))
+    else:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+def _handleAlarm(signum, frame):
+    """
+    Marks every armed timer whose deadline has passed as fired.  The
+    exception is only raised if one of them is inside call(); a deadline
+    that passes in between calls is reported by the next call instead.
+    """
+    now = time.time()
+    raiseTimeout = False
+    for timer in _ARMED_TIMERS:
+        if not timer.fired and timer.deadline <= now:
+            timer.fired = True
+            raiseTimeout = raiseTimeout or timer.calls > 0
+    _scheduleAlarm()
+    if raiseTimeout:
+        raise TimeoutFunctionException()
+
+def getActiveTimer():
+    "The innermost armed TurnTimer, or None if nothing is being timed"
+    if _ARMED_TIMERS:
+        return _ARMED_TIMERS[-1]
+    return None
+
+class TurnTimer:
+    """
+    A time budget in (fractional) seconds that starts when the timer is
+    created.  arm() programs the interval timer once; every call() made
+    until disarm() then shares the budget and raises a
+    TimeoutFunctionException as soon as the deadline passes.  Anytime
+    searches can poll timeLeft() to stop just before it.
+
+    Without SIGALRM (e.g. on Windows) call() can only check the budget
+    after the function has returned.
+    """
+    def __init__(self, budget):
+        self.budget = budget
+        self.start = time.time()
+        self.deadline = self.start + budget
+        self.calls = 0
+        self.fired = False
+        self.armed = False
+
+    def elapsed(self):
+        "Seconds used since the timer was created"
+        return time.time() - self.start
+
+    def timeLeft(self):
+        "Seconds left before the deadline (negative once it has passed)"
+        return self.deadline - time.time()
+
+    def expired(self):
+        return self.fired or time.time() >= self.deadline
+
+    def arm(self):
+        global _OLD_ALARM_HANDLER
+        if self.armed or not hasattr(signal, 'SIGALRM'): return
+        if not _ARMED_TIMERS:
+            _OLD_ALARM_HANDLER = signal.signal(signal.SIGALRM, _handleAlarm)
+        # Never outlive an enclosing timer
+        outer = getActiveTimer()
+        if outer is not None and outer.deadline < self.deadline:
+            self.deadline = outer.deadline
+        _ARMED_TIMERS.append(self)
+        self.armed = True
+        _scheduleAlarm()
+
+    def disarm(self):
+        if not self.armed: return
+        _ARMED_TIMERS.remove(self)
+        self.armed = False
+        _scheduleAlarm()
+        if not _ARMED_TIMERS:
+            signal.signal(signal.SIGALRM, _OLD_ALARM_HANDLER)
+
+    def call(self, function, *args, **keyArgs):
+        "Calls function, raising a TimeoutFunctionException if it runs past the deadline"
+        if self.expired():
+            raise TimeoutFunctionException()
+        self.calls += 1
+        try:
+            result = function(*args, **keyArgs)
+        finally:
+            self.calls -= 1
+        if not self.armed and self.expired():
+            raise TimeoutFunctionException()
+        return result
+
+
 class TimeoutFunction:
     def __init__(self, function, timeout):
         self.timeout = timeout
         self.function = function
 
-    def handle_timeout(self, signum, frame):
-        raise TimeoutFunctionException()
-
     def __call__(self, *args, **keyArgs):
-        # If we have SIGALRM signal, use it to cause an exception if and
-        # when this function runs too long.  Otherwise check the time taken
-        # after the method has returned, and throw an exception then.
-        if hasattr(signal, 'SIGALRM'):
-            old = signal.signal(signal.SIGALRM, self.handle_timeout)
-            signal.alarm(self.timeout)
-            try:
-                result = self.function(*args, **keyArgs)
-            finally:
-                signal.signal(signal.SIGALRM, old)
-            signal.alarm(0)
-        else:
-            startTime = time.time()
-            result = self.function(*args, **keyArgs)
-            timeElapsed = time.time() - startTime
-            if timeElapsed >= self.timeout:
-                self.handle_timeout(None, None)
-        return result
+        timer = TurnTimer(self.timeout)
+        timer.arm()
+        try:
+            return timer.call(self.function, *args, **keyArgs)
+        finally:
+            timer.disarm()
 
 
 